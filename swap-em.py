@@ -1,32 +1,35 @@
 import pygame
 import random
-import copy
 import os
+import io
 import json
 import math
+import argparse
+import asyncio
+import time
+import socket
+import threading
+
+import swap_em_rules as rules
+from swap_em_rules import GRID_WIDTH, GRID_HEIGHT, ALL_COLORS, COLOR_COUNTS, Tile
+from swap_em_save import Autosaver, SaveError, encode_state, encode_game, decode_state, read_file
+from swap_em_broadcast import Broadcaster, BoardMirror, MoveDelta, read_frames
+from swap_em_puzzles import PuzzlePack, PackError, RefillStream
 
 # Game constants
 SCREEN_WIDTH = 512
 SCREEN_HEIGHT = 548  # Increased to make room for score display
-GRID_WIDTH = 8
-GRID_HEIGHT = 8
 TILE_SIZE = 64
 NUM_COLORS = 8
-COLORS = ['red', 'blue', 'green', 'yellow', 'purple', 'aqua', 'hotpink', 'chocolate'][:NUM_COLORS]
+COLORS = ALL_COLORS[:NUM_COLORS]
 ANIMATION_SPEED = 1 # 1 for fast, 2 for regular and 3 for slow/degub
-
-class Tile:
-    def __init__(self, color, special_type=None):
-        self.color = color
-        self.special_type = special_type
-
-    def __eq__(self, other):
-        if isinstance(other, Tile):
-            return self.color == other.color
-        return False
-
-    def __str__(self):
-        return f"{self.color} ({self.special_type or 'normal'})"
+MAX_EFFECTS = 256  # Capacity of the effect pool, enough for several 'X' cascades
+ALPHA_BUCKET = 16  # Fade surfaces are cached per this many alpha steps
+FPS = 30  # Frame rate for the pulsing glow of special tiles and for input redraws
+MAX_FPS = 60  # Frame rate while removal fades, popups or the multiplier are animating
+POWER_SAVING = True  # Sleep until the next input event when nothing on screen changes
+SHOW_FPS = False  # Report the effective frame rate once a second, also set by --show-fps
+BROADCAST_EVENT = pygame.USEREVENT + 1  # Frames received by a spectator
 
 class MultiplierDisplay:
     def __init__(self):
@@ -34,26 +37,122 @@ class MultiplierDisplay:
         self.display_time = 0
         self.font = pygame.font.Font(None, 48)  # Base font size
         self.alpha = 255
+        self.text_cache = {}  # multiplier value -> rendered text surface
         
     def update(self, new_value):
         self.value = new_value
         self.display_time = 60  # frames to display
         self.alpha = 255
+
+    def get_text(self, value):
+        # Render each multiplier only once, fonts are expensive to create
+        if value not in self.text_cache:
+            # Dynamic font size based on multiplier
+            font_size = 36 + (value * 6)  # Increases font size with multiplier
+            font = pygame.font.Font(None, font_size)
+            self.text_cache[value] = font.render(f'{value}x', True, pygame.Color('yellow'))
+        return self.text_cache[value]
         
     def draw(self, surface, pos):
         if self.display_time > 0 and self.value > 1:
-            # Dynamic font size based on multiplier
-            font_size = 36 + (self.value * 6)  # Increases font size with multiplier
-            font = pygame.font.Font(None, font_size)
-            
-            text = font.render(f'{self.value}x', True, pygame.Color('yellow'))
-            text.set_alpha(self.alpha)
+            text = self.get_text(self.value)
+            # Quantize alpha so the fade matches the effect pool buckets
+            text.set_alpha(self.alpha - self.alpha % ALPHA_BUCKET)
             text_rect = text.get_rect(center=pos)
             surface.blit(text, text_rect)
             
             self.display_time -= 1
             self.alpha = int(255 * (self.display_time / 60))
 
+class EffectPool:
+    """
+    Fixed-capacity pool for short-lived visual effects (tile removal fades and score popups).
+
+    Effects are stored as parallel arrays and aged in place. Expired effects are
+    deleted by moving the last live effect into their slot, so a frame costs
+    O(live effects) no matter how large the cascade was.
+    """
+    FADE = 0
+    POPUP = 1
+
+    def __init__(self, capacity=MAX_EFFECTS):
+        self.capacity = capacity
+        self.count = 0
+        self.kind = [0] * capacity
+        self.x = [0] * capacity
+        self.y = [0] * capacity
+        self.alpha = [0] * capacity
+        self.value = [0] * capacity  # Points shown by a popup
+        self.font = pygame.font.Font(None, 32)
+        self.fade_surfaces = {}  # alpha bucket -> white tile surface
+        self.popup_texts = {}  # points -> rendered text surface
+
+    def spawn(self, kind, x, y, value=0):
+        # Drop new effects when full rather than growing, a missing sparkle is
+        # cheaper than a dropped frame
+        if self.count >= self.capacity:
+            return
+        i = self.count
+        self.kind[i] = kind
+        self.x[i] = x
+        self.y[i] = y
+        self.alpha[i] = 255
+        self.value[i] = value
+        self.count += 1
+
+    def add_fade(self, x, y):
+        self.spawn(self.FADE, x, y)
+
+    def add_popup(self, x, y, points):
+        self.spawn(self.POPUP, x, y, points)
+
+    def clear(self):
+        self.count = 0
+
+    def get_fade_surface(self, alpha):
+        bucket = alpha // ALPHA_BUCKET
+        surf = self.fade_surfaces.get(bucket)
+        if surf is None:
+            surf = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+            surf.fill((255, 255, 255, min(255, bucket * ALPHA_BUCKET)))
+            self.fade_surfaces[bucket] = surf
+        return surf
+
+    def get_popup_text(self, points):
+        text = self.popup_texts.get(points)
+        if text is None:
+            text = self.font.render(f'+{points}', True, pygame.Color('white'))
+            self.popup_texts[points] = text
+        return text
+
+    def update_and_draw(self, surface):
+        kind, xs, ys, alphas, values = self.kind, self.x, self.y, self.alpha, self.value
+        i = 0
+        while i < self.count:
+            alpha = alphas[i]
+            if kind[i] == self.FADE:
+                surface.blit(self.get_fade_surface(alpha), (xs[i], ys[i]))
+                alpha -= 10
+            else:
+                text = self.get_popup_text(values[i])
+                text.set_alpha(alpha - alpha % ALPHA_BUCKET)
+                surface.blit(text, text.get_rect(center=(xs[i], ys[i])))
+                ys[i] -= 1  # Popups drift upwards while fading
+                alpha -= 8
+
+            if alpha > 0:
+                alphas[i] = alpha
+                i += 1
+            else:
+                # Swap-remove: move the last live effect into this slot
+                last = self.count - 1
+                kind[i] = kind[last]
+                xs[i] = xs[last]
+                ys[i] = ys[last]
+                alphas[i] = alphas[last]
+                values[i] = values[last]
+                self.count = last
+
 class MatchThreeGame:
     def __init__(self):
         pygame.init()
@@ -61,6 +160,14 @@ class MatchThreeGame:
         pygame.display.set_caption('Swap\'em! A Match Three Game')
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 36)
+
+        # Frame pacing
+        self.power_saving = POWER_SAVING
+        self.show_fps = SHOW_FPS
+        self.redraw_pending = True  # Events were handled but not yet drawn
+        self.frame_count = 0
+        self.fps_timer = pygame.time.get_ticks()
+        self.effective_fps = 0.0
         
         # Initialize grid
         self.grid = None  # Will be populated in reset_game()
@@ -68,6 +175,26 @@ class MatchThreeGame:
         # JSON-based high score management
         self.high_score_file = 'swap_em_highscores.json'
         self.high_scores = self.load_high_scores()
+
+        # Binary snapshot of the game in progress, written in the background
+        self.save_file = 'swap_em_save.bin'
+        self.saved_game = read_file(self.save_file)
+        self.autosaver = Autosaver(self.save_file)
+        self.resume_button = pygame.Rect(SCREEN_WIDTH//2 - 80, 410 - 25, 160, 50)
+
+        # Set to a Broadcaster to stream every board and move to spectators
+        self.broadcaster = None
+
+        # Puzzle mode, the pack is only opened when the first puzzle is started
+        self.puzzle_file = 'assets/puzzles.pack'
+        self.puzzles = None
+        self.puzzle = None  # Puzzle being played, None in endless games
+        self.puzzle_index = 0
+        self.puzzle_targets = set()  # (y, x) cells still to clear
+        self.puzzle_moves_left = 0
+        self.puzzle_solved = False
+        self.puzzle_button = pygame.Rect(SCREEN_WIDTH//2 - 80, 190 - 25, 160, 50)
+        self.refill_rng = random  # Source of refills and special tiles, a RefillStream in puzzles
         
         # Pre-initialize color_buttons to avoid AttributeError
         self.color_buttons = [
@@ -77,13 +204,16 @@ class MatchThreeGame:
             (pygame.Rect(SCREEN_WIDTH//2 + 150 - 50, 300 - 25, 100, 50), '8')
         ]
         self.score = 0
+        self.chain_multiplier = 1
+        self.selected_tile = None
+        self.game_over = False
         self.game_over_tip = None
         self.in_start_menu = True
         self.current_color_count = 8  # Default
         self.high_score = self.high_scores.get(str(self.current_color_count), 0)
         self.multiplier_display = MultiplierDisplay()
-        self.score_popups = []
-        self.removal_effects = []  # List of (rect, alpha) tuples
+        self.effects = EffectPool()  # Removal fades and score popups
+        self.gradient_cache = {}  # (color, size) -> tile gradient surface
 
         # Load special tile images
         self.special_tile_images = {}
@@ -102,11 +232,80 @@ class MatchThreeGame:
             self.special_tile_images = {}
 
     def reset_game(self):
+        self.puzzle = None
+        self.refill_rng = random
         self.grid = self.create_grid_without_matches()
+        self.effects.clear()
         self.selected_tile = None
         self.game_over = False
         self.score = 0
         self.chain_multiplier = 1
+        # A new board replaces the saved game and the spectators' board,
+        # also when a finished game is restarted
+        self.broadcast_board()
+        self.autosave()
+
+    def autosave(self):
+        # Encoding takes microseconds, the disk write happens on the autosave thread
+        self.saved_game = encode_state(self.grid, self.score, self.chain_multiplier,
+                                       self.current_color_count, random.getstate())
+        self.autosaver.save(self.saved_game)
+
+    def discard_saved_game(self):
+        self.saved_game = None
+        self.autosaver.delete()
+
+    def resume_game(self):
+        """
+        Restore the board, score and random state of the saved game
+        
+        Returns:
+            bool: True if the game was resumed, False if the snapshot could not be read
+        """
+        try:
+            state = decode_state(self.saved_game)
+        except SaveError as e:
+            print(f"Could not resume game: {e}")
+            self.discard_saved_game()
+            return False
+
+        self.load_state(state)
+        self.in_start_menu = False
+        return True
+
+    def load_state(self, state):
+        # Continue the game of a decoded snapshot, including its random state
+        self.show_board(state)
+        random.setstate(state['rng_state'])
+        self.puzzle = None
+        self.refill_rng = random
+        self.broadcast_board()
+
+    def show_board(self, state):
+        # Put a decoded snapshot on the board without touching the random state or spectators
+        global COLORS
+        self.current_color_count = state['color_count']
+        COLORS = ALL_COLORS[:self.current_color_count]
+        self.high_score = self.high_scores.get(str(self.current_color_count), 0)
+
+        self.grid = state['grid']
+        self.score = state['score']
+        self.chain_multiplier = state['chain_multiplier']
+
+        self.effects.clear()
+        self.selected_tile = None
+        self.game_over = False
+
+    def broadcast_board(self):
+        # Spectators get the whole board when a game is dealt or resumed, and deltas after that
+        if self.broadcaster:
+            self.broadcaster.publish_snapshot(self.grid, self.current_color_count,
+                                              self.score, self.chain_multiplier, self.game_over)
+
+    def present(self, surface):
+        # Only the window needs flipping, offscreen surfaces are used as they are
+        if surface is self.screen:
+            pygame.display.flip()
 
     def draw_gradient_button(self, surface, color, rect, hover=False):
         # Create a gradient button similar to tile gradient
@@ -129,15 +328,20 @@ class MatchThreeGame:
         # Draw border
         pygame.draw.rect(surface, pygame.Color('white'), rect, 2)
 
-    def draw_start_menu(self):
+    def draw_start_menu(self, surface=None, mouse_pos=None):
+        if surface is None:
+            surface = self.screen
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+
         # Ensure screen is properly drawn every frame
-        self.screen.fill(pygame.Color('black'))
+        surface.fill(pygame.Color('black'))
         
         # Title
         title_font = pygame.font.Font(None, 74)
         title = title_font.render('Swap\'em!', True, pygame.Color('white'))
         title_rect = title.get_rect(center=(SCREEN_WIDTH//2, 100))
-        self.screen.blit(title, title_rect)
+        surface.blit(title, title_rect)
         
         # Color selection buttons - now with gradients
         color_options = [
@@ -147,8 +351,6 @@ class MatchThreeGame:
             (SCREEN_WIDTH//2 + 150, 300, '8', 'purple')
         ]
         
-        mouse_pos = pygame.mouse.get_pos()
-        
         for idx, (x, y, num_colors, color) in enumerate(color_options):
             button_rect = self.color_buttons[idx][0]
             
@@ -156,20 +358,36 @@ class MatchThreeGame:
             hover = button_rect.collidepoint(mouse_pos)
             
             # Draw gradient button
-            self.draw_gradient_button(self.screen, color, button_rect, hover)
+            self.draw_gradient_button(surface, color, button_rect, hover)
             
             # Button text
             button_font = pygame.font.Font(None, 36)
             button_text = button_font.render(f'{num_colors} Col', True, pygame.Color('white'))
             button_text_rect = button_text.get_rect(center=button_rect.center)
-            self.screen.blit(button_text, button_text_rect)
+            surface.blit(button_text, button_text_rect)
             
             # High score for this color count
             # high_score_text = self.font.render(f'High: {self.high_scores[num_colors]}', 
             high_score_text = self.font.render(f'{self.high_scores[num_colors]}', 
                                                 True, pygame.Color('yellow'))
             high_score_rect = high_score_text.get_rect(center=(x, y + 50))
-            self.screen.blit(high_score_text, high_score_rect)
+            surface.blit(high_score_text, high_score_rect)
+
+        # Puzzle button, only when there is a puzzle pack
+        if os.path.exists(self.puzzle_file):
+            hover = self.puzzle_button.collidepoint(mouse_pos)
+            self.draw_gradient_button(surface, 'teal', self.puzzle_button, hover)
+            puzzle_text = self.font.render(f'Puzzle {self.puzzle_index + 1}', True, pygame.Color('white'))
+            puzzle_rect = puzzle_text.get_rect(center=self.puzzle_button.center)
+            surface.blit(puzzle_text, puzzle_rect)
+
+        # Resume button, only when there is a game to resume
+        if self.saved_game:
+            hover = self.resume_button.collidepoint(mouse_pos)
+            self.draw_gradient_button(surface, 'darkorange', self.resume_button, hover)
+            resume_text = self.font.render('Resume', True, pygame.Color('white'))
+            resume_rect = resume_text.get_rect(center=self.resume_button.center)
+            surface.blit(resume_text, resume_rect)
         
         # Quit instructions
         quit_font = pygame.font.Font(None, 24)
@@ -178,10 +396,10 @@ class MatchThreeGame:
         credits = quit_font.render("Made by Jussi & Claude 3.5 Haiku", True, pygame.Color('yellow'))
         credits_rect = credits.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 80))
 
-        self.screen.blit(quit_text, quit_rect)        
-        self.screen.blit(credits, credits_rect)
+        surface.blit(quit_text, quit_rect)        
+        surface.blit(credits, credits_rect)
         
-        pygame.display.flip()
+        self.present(surface)
 
     def load_high_scores(self):
         if not os.path.exists(self.high_score_file):
@@ -211,15 +429,10 @@ class MatchThreeGame:
             print("Could not save high scores")
 
     def create_random_tile(self):
-        return Tile(random.choice(COLORS[:self.current_color_count]))
+        return Tile(self.refill_rng.choice(COLORS[:self.current_color_count]))
 
     def create_grid_without_matches(self):
-        while True:
-            grid = [[self.create_random_tile() for _ in range(GRID_WIDTH)] 
-                    for _ in range(GRID_HEIGHT)]
-            test_grid = copy.deepcopy(grid)
-            if not self.check_matches(test_grid):
-                return grid
+        return rules.create_grid_without_matches(COLORS[:self.current_color_count])
 
     def handle_special_tile_effects(self, initial_matches):
         """
@@ -231,120 +444,47 @@ class MatchThreeGame:
         Returns:
             set: All tiles to be removed, including those from special tile chain reactions
         """
-        tiles_to_remove = set(initial_matches)
-        processed_special_tiles = set()
-        
-        def process_special_tile(y, x):
-            # Prevent processing the same special tile multiple times
-            if (y, x) in processed_special_tiles:
-                return set()
-            
-            tile = self.grid[y][x]
-            special_removal = set()
-            
-            if tile and tile.special_type:
-                processed_special_tiles.add((y, x))
-                
-                if tile.special_type == 'L':  # Horizontal line
-                    for col in range(GRID_WIDTH):
-                        special_removal.add((y, col))
-                elif tile.special_type == 'D':  # Vertical line
-                    for row in range(GRID_HEIGHT):
-                        special_removal.add((row, x))
-                elif tile.special_type == 'X':  # Cross
-                    for col in range(GRID_WIDTH):
-                        special_removal.add((y, col))
-                    for row in range(GRID_HEIGHT):
-                        special_removal.add((row, x))
-            
-            return special_removal
-
-        # First pass: process initial special tiles in the matches
-        additional_special_removals = set()
-        for y, x in initial_matches:
-            special_removals = process_special_tile(y, x)
-            additional_special_removals.update(special_removals)
-        
-        tiles_to_remove.update(additional_special_removals)
-        
-        # Recursive pass: check if new special tile removals create more special tile effects
-        while additional_special_removals:
-            next_special_removals = set()
-            for y, x in additional_special_removals:
-                special_removals = process_special_tile(y, x)
-                next_special_removals.update(special_removals)
-            
-            tiles_to_remove.update(next_special_removals)
-            additional_special_removals = next_special_removals
-        
-        return tiles_to_remove
+        return rules.find_special_removals(self.grid, initial_matches)
 
     def handle_match_creation(self, matches):
-        match_count = len(matches)
-        
-        # Get the columns where matches occurred
-        match_columns = set(x for (y, x) in matches)
-        
-        # Only proceed if we have enough matches to create a special tile
-        if match_count >= 4:
-            random_color = random.choice(COLORS[:self.current_color_count])
-            special_tile = None
-
-            if match_count == 4:
-                special_tile = Tile(random_color, special_type='L')
-            elif match_count == 5:
-                special_tile = Tile(random_color, special_type='D')
-            elif match_count >= 6:
-                special_tile = Tile(random_color, special_type='X')
-            
-            if special_tile:
-                # Choose a random column from the columns where matches occurred
-                random_col = random.choice(list(match_columns))
-                # Place the special tile at the top
-                self.grid[0][random_col] = special_tile
+        return rules.place_special_tile(self.grid, matches, COLORS[:self.current_color_count], self.refill_rng)
 
     def check_matches(self, grid=None):
         if grid is None:
             grid = self.grid
-        matches = set()
-        
-        # Horizontal matches
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH-2):
-                if (grid[y][x] and grid[y][x+1] and grid[y][x+2] and
-                    grid[y][x].color == grid[y][x+1].color == grid[y][x+2].color):
-                    matches.update([(y, x), (y, x+1), (y, x+2)])
-
-        # Vertical matches
-        for x in range(GRID_WIDTH):
-            for y in range(GRID_HEIGHT-2):
-                if (grid[y][x] and grid[y+1][x] and grid[y+2][x] and
-                    grid[y][x].color == grid[y+1][x].color == grid[y+2][x].color):
-                    matches.update([(y, x), (y+1, x), (y+2, x)])
-
-        return matches
+        return rules.check_matches(grid)
 
     def draw_gradient_rect(self, surface, color, rect):
-        # Create a gradient effect for tiles
-        base_color = pygame.Color(color)
-        
-        # Create a lighter version of the base color
-        lighter_color = base_color.lerp(pygame.Color('white'), 0.3)
-        
-        # Create gradient surface
-        gradient_surf = pygame.Surface(rect.size)
-        for y in range(rect.height):
-            # Interpolate between base color and lighter color
-            inter_color = base_color.lerp(lighter_color, y / rect.height)
-            pygame.draw.line(gradient_surf, inter_color, (0, y), (rect.width, y))
+        # Tiles only come in a few colors, so each gradient is drawn once and reused
+        gradient_surf = self.gradient_cache.get((color, rect.size))
+        if gradient_surf is None:
+            # Create a gradient effect for tiles
+            base_color = pygame.Color(color)
+            
+            # Create a lighter version of the base color
+            lighter_color = base_color.lerp(pygame.Color('white'), 0.3)
+            
+            # Create gradient surface
+            gradient_surf = pygame.Surface(rect.size)
+            for y in range(rect.height):
+                # Interpolate between base color and lighter color
+                inter_color = base_color.lerp(lighter_color, y / rect.height)
+                pygame.draw.line(gradient_surf, inter_color, (0, y), (rect.width, y))
+            self.gradient_cache[(color, rect.size)] = gradient_surf
         
         surface.blit(gradient_surf, rect)
 
-    def draw_grid(self):
+    def draw_grid(self, surface=None, mouse_pos=None, ticks=None):
         if self.in_start_menu or self.grid is None:
             return  # Don't try to draw grid during start menu
-            
-        mouse_pos = pygame.mouse.get_pos()
+
+        # Offscreen renders pass a fixed mouse position and time to get repeatable images
+        if surface is None:
+            surface = self.screen
+        if mouse_pos is None:
+            mouse_pos = pygame.mouse.get_pos()
+        if ticks is None:
+            ticks = pygame.time.get_ticks()
         
         for y in range(GRID_HEIGHT):
             for x in range(GRID_WIDTH):
@@ -353,51 +493,49 @@ class MatchThreeGame:
                     tile_rect = pygame.Rect(x*TILE_SIZE, y*TILE_SIZE + 36, TILE_SIZE, TILE_SIZE)
                     
                     # Draw gradient tile
-                    self.draw_gradient_rect(self.screen, tile.color, tile_rect)
+                    self.draw_gradient_rect(surface, tile.color, tile_rect)
                     
                     # Draw special tile marker if it's a special tile
                     if tile.special_type:
                         # Draw glowing effect
                         glow_surf = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
                         glow_color = pygame.Color('yellow')
-                        glow_color.a = 100 + int(50 * math.sin(pygame.time.get_ticks() / 200))  # Pulsing effect
+                        glow_color.a = 100 + int(50 * math.sin(ticks / 200))  # Pulsing effect
                         pygame.draw.rect(glow_surf, glow_color, glow_surf.get_rect(), 4)
-                        self.screen.blit(glow_surf, tile_rect)
+                        surface.blit(glow_surf, tile_rect)
                         
                         # Try to draw PNG image, fall back to letter if not available
                         if tile.special_type in self.special_tile_images:
                             # Draw PNG image
                             image = self.special_tile_images[tile.special_type]
-                            self.screen.blit(image, tile_rect)
+                            surface.blit(image, tile_rect)
                         else:
                             # Fallback to letter representation
                             font = pygame.font.Font(None, 48)
                             symbol = font.render(tile.special_type, True, pygame.Color('white'))
                             symbol_rect = symbol.get_rect(center=tile_rect.center)
-                            self.screen.blit(symbol, symbol_rect)
+                            surface.blit(symbol, symbol_rect)
                     
                     # Draw white border
-                    pygame.draw.rect(self.screen, pygame.Color('white'), tile_rect, 1)
+                    pygame.draw.rect(surface, pygame.Color('white'), tile_rect, 1)
 
                     # Hover highlight
                     if tile_rect.collidepoint(mouse_pos):
                         highlight_surface = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
                         pygame.draw.rect(highlight_surface, (255, 255, 255, 200), highlight_surface.get_rect(), 4)
-                        self.screen.blit(highlight_surface, tile_rect)
+                        surface.blit(highlight_surface, tile_rect)
 
                     # Selected tile highlight
                     if self.selected_tile and (x, y) == self.selected_tile:
                         highlight_rect = pygame.Rect(x*TILE_SIZE, y*TILE_SIZE + 36, TILE_SIZE, TILE_SIZE)
                         highlight_surface = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
                         pygame.draw.rect(highlight_surface, (255, 255, 255, 100), highlight_surface.get_rect(), 8)
-                        self.screen.blit(highlight_surface, highlight_rect)
+                        surface.blit(highlight_surface, highlight_rect)
 
-    def draw_fade_effect(self, surface, rect, alpha):
-        # Ensure alpha is within valid range
-        alpha = max(0, min(255, int(alpha)))  # Clamp between 0 and 255
-        effect_surface = pygame.Surface(rect.size, pygame.SRCALPHA)
-        pygame.draw.rect(effect_surface, (255, 255, 255, alpha), effect_surface.get_rect())
-        surface.blit(effect_surface, rect)
+        # Mark the puzzle cells that still need clearing
+        for y, x in self.puzzle_targets if self.puzzle else ():
+            target_rect = pygame.Rect(x*TILE_SIZE, y*TILE_SIZE + 36, TILE_SIZE, TILE_SIZE).inflate(-8, -8)
+            pygame.draw.rect(surface, pygame.Color('gold'), target_rect, 3)
 
     def get_tile_at_pos(self, pos):
         x, y = pos
@@ -416,32 +554,27 @@ class MatchThreeGame:
         Returns:
             bool: True if moves are available, False otherwise
         """
-        # Similar to previous implementation
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                # Check horizontal swaps
-                if x < GRID_WIDTH - 1:
-                    # Simulate swap
-                    self.grid[y][x], self.grid[y][x+1] = self.grid[y][x+1], self.grid[y][x]
-                    matches = self.check_matches()
-                    # Swap back
-                    self.grid[y][x], self.grid[y][x+1] = self.grid[y][x+1], self.grid[y][x]
-                    if matches:
-                        return True
+        return rules.has_valid_moves(self.grid)
+
+    def animate_swap(self, tile1, tile2, surface=None):
+        for delay in self.animate_swap_steps(tile1, tile2, surface):
+            # Offscreen targets are drawn as fast as possible
+            if surface is None or surface is self.screen:
+                # Add a small delay to control animation speed
+                pygame.time.delay(delay)
                 
-                # Check vertical swaps
-                if y < GRID_HEIGHT - 1:
-                    # Simulate swap
-                    self.grid[y][x], self.grid[y+1][x] = self.grid[y+1][x], self.grid[y][x]
-                    matches = self.check_matches()
-                    # Swap back
-                    self.grid[y][x], self.grid[y+1][x] = self.grid[y+1][x], self.grid[y][x]
-                    if matches:
-                        return True
-        
-        return False
-
-    def animate_swap(self, tile1, tile2):
+                # Process events to keep the window responsive
+                pygame.event.pump()
+
+    def animate_swap_steps(self, tile1, tile2, surface=None):
+        """
+        Draw the swap animation one frame at a time
+        
+        Yields:
+            int: Milliseconds to wait before the next frame
+        """
+        if surface is None:
+            surface = self.screen
         x1, y1 = tile1
         x2, y2 = tile2
         
@@ -449,18 +582,18 @@ class MatchThreeGame:
             progress = (step + 1) / 6
             
             # Clear the screen
-            self.screen.fill(pygame.Color('black'))
+            surface.fill(pygame.Color('black'))
             
             # Draw score and other UI elements
-            self.draw_score()
+            self.draw_score(surface)
             
             # Draw other tiles
             for y in range(GRID_HEIGHT):
                 for x in range(GRID_WIDTH):
                     if (x, y) != tile1 and (x, y) != tile2 and self.grid[y][x]:
                         tile_rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE + 36, TILE_SIZE, TILE_SIZE)
-                        self.draw_gradient_rect(self.screen, self.grid[y][x].color, tile_rect)
-                        pygame.draw.rect(self.screen, pygame.Color('white'), tile_rect, 1)
+                        self.draw_gradient_rect(surface, self.grid[y][x].color, tile_rect)
+                        pygame.draw.rect(surface, pygame.Color('white'), tile_rect, 1)
             
             # Interpolate swap positions
             swap_x1 = x1 * TILE_SIZE + (x2 - x1) * TILE_SIZE * progress
@@ -472,20 +605,15 @@ class MatchThreeGame:
             tile1_rect = pygame.Rect(swap_x1, swap_y1, TILE_SIZE, TILE_SIZE)
             tile2_rect = pygame.Rect(swap_x2, swap_y2, TILE_SIZE, TILE_SIZE)
             
-            self.draw_gradient_rect(self.screen, self.grid[y1][x1].color, tile1_rect)
-            self.draw_gradient_rect(self.screen, self.grid[y2][x2].color, tile2_rect)
+            self.draw_gradient_rect(surface, self.grid[y1][x1].color, tile1_rect)
+            self.draw_gradient_rect(surface, self.grid[y2][x2].color, tile2_rect)
             
-            pygame.draw.rect(self.screen, pygame.Color('white'), tile1_rect, 1)
-            pygame.draw.rect(self.screen, pygame.Color('white'), tile2_rect, 1)
+            pygame.draw.rect(surface, pygame.Color('white'), tile1_rect, 1)
+            pygame.draw.rect(surface, pygame.Color('white'), tile2_rect, 1)
             
             # Update the display
-            pygame.display.flip()
-            
-            # Add a small delay to control animation speed
-            pygame.time.delay(ANIMATION_SPEED * 10)
-            
-            # Process events to keep the window responsive
-            pygame.event.pump()
+            self.present(surface)
+            yield ANIMATION_SPEED * 10
 
     def animate_fall(self):
         # Falling animation logic
@@ -518,31 +646,15 @@ class MatchThreeGame:
                     self.grid[y][x] = non_empty[y] or self.create_random_tile()
 
     def calculate_match_score(self, matches, tiles_to_remove):
-        # Calculate base score based on number of initial matches
-        match_count = len(matches)
-        extra_tiles = len(tiles_to_remove)
-        base_score = 0
-        
-        if match_count == 3:
-            base_score = 30 * self.chain_multiplier
-        elif match_count == 4:
-            base_score = 50 * self.chain_multiplier
-        elif match_count == 5:
-            base_score = 100 * self.chain_multiplier
-        elif match_count >= 6:
-            base_score = 200 * self.chain_multiplier
-        
-        # Calculate bonus points only for additional tiles removed by special effects
-        # (total tiles - matched tiles) * 10 points per tile
-        special_effect_tiles = max(0, extra_tiles - 3)  # Tiles beyond the minimum match of 3
-        special_effect_score = special_effect_tiles * 10 * self.chain_multiplier
-        
-        total_score = base_score + special_effect_score
-        
-        return total_score
-
-    def animate_fall_with_delay(self):
-        # Falling animation with delay
+        return rules.calculate_match_score(matches, tiles_to_remove, self.chain_multiplier)
+
+    def animate_fall_steps(self):
+        """
+        Falling animation, one tile at a time
+        
+        Yields:
+            int: Milliseconds to wait before the next frame
+        """
         for x in range(GRID_WIDTH):
             column = [self.grid[y][x] for y in range(GRID_HEIGHT)]
             empty_slots = column.count(None)
@@ -561,17 +673,23 @@ class MatchThreeGame:
                     self.draw_score()
                     self.draw_grid()
                     self.draw_game_state()
-                    pygame.time.delay(ANIMATION_SPEED * 15)  # Add a small delay between falling blocks
+                    yield ANIMATION_SPEED * 15  # Add a small delay between falling blocks
 
-    def draw_score(self):
+    def draw_score(self, surface=None):
+        if surface is None:
+            surface = self.screen
         # Draw current score
         score_text = self.font.render(f'Score: {self.score}', True, pygame.Color('white'))
-        self.screen.blit(score_text, (10, 8))
+        surface.blit(score_text, (10, 8))
         
-        # Draw high score
-        high_score_text = self.font.render(f'High Score: {self.high_score}', True, pygame.Color('yellow'))
+        # Draw high score, or the moves left in a puzzle
+        if self.puzzle:
+            high_score_text = self.font.render(f'Puzzle {self.puzzle_index + 1}: {self.puzzle_moves_left} moves left',
+                                               True, pygame.Color('yellow'))
+        else:
+            high_score_text = self.font.render(f'High Score: {self.high_score}', True, pygame.Color('yellow'))
         high_score_rect = high_score_text.get_rect(right=SCREEN_WIDTH-10, top=8)
-        self.screen.blit(high_score_text, high_score_rect)
+        surface.blit(high_score_text, high_score_rect)
 
 
     def get_random_game_tip(self):
@@ -592,19 +710,22 @@ class MatchThreeGame:
         ]
         return random.choice(tips)
 
-    def game_over_screen(self):
+    def game_over_screen(self, surface=None):
+        if surface is None:
+            surface = self.screen
+
         # Select a random game tip if not already selected
         if not self.game_over_tip:
             self.game_over_tip = self.get_random_game_tip()
 
         # Clear screen with black background
-        self.screen.fill(pygame.Color('black'))
+        surface.fill(pygame.Color('black'))
 
         # Draw score
         score_font = pygame.font.Font(None, 48)
         score_text = score_font.render(f'Final Score: {self.score}', True, pygame.Color('white'))
         score_rect = score_text.get_rect(center=(SCREEN_WIDTH//2, 100))
-        self.screen.blit(score_text, score_rect)
+        surface.blit(score_text, score_rect)
 
         # Check for high score
         is_new_highscore = self.score > int(self.high_scores[str(self.current_color_count)])
@@ -616,7 +737,7 @@ class MatchThreeGame:
         gameover_font = pygame.font.Font(None, 74)
         gameover_text = gameover_font.render('Game Over', True, pygame.Color('white'))
         gameover_rect = gameover_text.get_rect(center=(SCREEN_WIDTH//2, 220))
-        self.screen.blit(gameover_text, gameover_rect)
+        surface.blit(gameover_text, gameover_rect)
         
         # Tip text
         tip_font = pygame.font.Font(None, 36)
@@ -625,45 +746,495 @@ class MatchThreeGame:
         for line in tip_lines:
             tip_text = tip_font.render(line, True, pygame.Color('yellow'))
             tip_rect = tip_text.get_rect(center=(SCREEN_WIDTH//2, tip_y))
-            self.screen.blit(tip_text, tip_rect)
+            surface.blit(tip_text, tip_rect)
             tip_y += 30
         
         # Restart instructions
         restart_font = pygame.font.Font(None, 36)
         restart_text = restart_font.render('Click to Restart', True, pygame.Color('white'))
         restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 100))
-        self.screen.blit(restart_text, restart_rect)
+        surface.blit(restart_text, restart_rect)
 
-        pygame.display.flip()
+        self.present(surface)
         
-    def draw_game_state(self):
+    def puzzle_result_screen(self, surface=None):
+        if surface is None:
+            surface = self.screen
+        surface.fill(pygame.Color('black'))
+
+        result_font = pygame.font.Font(None, 74)
+        result = 'Puzzle Solved!' if self.puzzle_solved else 'Out of Moves'
+        result_text = result_font.render(result, True, pygame.Color('white'))
+        result_rect = result_text.get_rect(center=(SCREEN_WIDTH//2, 200))
+        surface.blit(result_text, result_rect)
+
+        if self.puzzle_solved:
+            detail = f'Puzzle {self.puzzle_index + 1} in {self.puzzle.moves - self.puzzle_moves_left} moves'
+        else:
+            detail = f'{len(self.puzzle_targets)} cells left to clear'
+        detail_text = self.font.render(detail, True, pygame.Color('yellow'))
+        detail_rect = detail_text.get_rect(center=(SCREEN_WIDTH//2, 280))
+        surface.blit(detail_text, detail_rect)
+
+        action = 'Click for the Next Puzzle' if self.puzzle_solved else 'Click to Try Again'
+        action_text = self.font.render(action, True, pygame.Color('white'))
+        action_rect = action_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT - 100))
+        surface.blit(action_text, action_rect)
+
+        self.present(surface)
+
+    def next_puzzle_index(self):
+        # A solved puzzle moves on to the next one, a failed one is tried again
+        return self.puzzle_index + 1 if self.puzzle_solved else self.puzzle_index
+
+    def draw_game_state(self, surface=None):
+        if surface is None:
+            surface = self.screen
         if not self.in_start_menu:
             if not self.game_over:
-                self.screen.fill(pygame.Color('black'))
-            self.draw_score()
-            self.draw_grid()
+                surface.fill(pygame.Color('black'))
+            self.draw_score(surface)
+            self.draw_grid(surface)
             
             # Draw chain multiplier
             if self.chain_multiplier > 1:
-                self.multiplier_display.draw(self.screen, (SCREEN_WIDTH - 100, 100))
+                self.multiplier_display.draw(surface, (SCREEN_WIDTH - 100, 100))
             
-            # Draw score popups
-            for popup in self.score_popups[:]:
-                popup.draw(self.screen)
-                popup.update()
-                if popup.lifetime <= 0:
-                    self.score_popups.remove(popup)
-            
-            # Draw removal effects
-            for effect in self.removal_effects[:]:
-                rect, alpha = effect
-                self.draw_fade_effect(self.screen, rect, alpha)
-                if alpha > 0:
-                    self.removal_effects[self.removal_effects.index(effect)] = (rect, alpha - 10)
+            # Draw removal effects and score popups
+            self.effects.update_and_draw(surface)
+        
+        self.present(surface)
+
+    def render_frame(self, surface, mouse_pos=(-1, -1), ticks=0):
+        # Score bar and board as drawn by the gameplay loop, without effects or input
+        surface.fill(pygame.Color('black'))
+        self.draw_score(surface)
+        self.draw_grid(surface, mouse_pos, ticks)
+
+    def save_display_state(self):
+        # Everything offscreen rendering changes, so the live game can be put back afterwards
+        return (self.in_start_menu, self.current_color_count, COLORS, self.high_score, self.grid, self.score,
+                self.chain_multiplier, self.effects, self.selected_tile, self.game_over, self.puzzle)
+
+    def restore_display_state(self, saved):
+        global COLORS
+        (self.in_start_menu, self.current_color_count, COLORS, self.high_score, self.grid, self.score,
+         self.chain_multiplier, self.effects, self.selected_tile, self.game_over, self.puzzle) = saved
+
+    def render_snapshots(self, snapshots, output_dir=None, high_score=0):
+        """
+        Render saved board states offscreen, e.g. for golden image comparisons
+
+        The game's own board, score and screen are restored afterwards.
+        
+        Args:
+            snapshots (list): Snapshot bytes as made by encode_state()
+            output_dir (str): Directory to write board_0000.png etc. to, None to keep the PNGs in memory
+            high_score (int): High score to show, fixed so images do not depend on the local high score file
+        
+        Returns:
+            list: Paths of the written files, or PNG data as bytes
+        """
+        surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        saved = self.save_display_state()
+        self.in_start_menu = False
+        self.effects = EffectPool()
+        self.puzzle = None
+        results = []
+        try:
+            for index, data in enumerate(snapshots):
+                self.show_board(decode_state(data))
+                self.high_score = high_score
+                self.render_frame(surface)
+                if output_dir:
+                    path = os.path.join(output_dir, f'board_{index:04d}.png')
+                    pygame.image.save(surface, path)
+                    results.append(path)
                 else:
-                    self.removal_effects.remove(effect)
+                    buffer = io.BytesIO()
+                    pygame.image.save(surface, buffer, 'board.png')
+                    results.append(buffer.getvalue())
+        finally:
+            self.restore_display_state(saved)
+        return results
+
+    def benchmark_rendering(self, snapshots, frames=300):
+        """
+        Measure the drawing code alone on an offscreen surface, leaving the game as it was
         
-        pygame.display.flip()
+        Returns:
+            dict: Frames per second for board frames and for swap animation frames
+        """
+        surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        states = [decode_state(data) for data in snapshots]
+        saved = self.save_display_state()
+        self.in_start_menu = False
+        self.effects = EffectPool()
+        self.puzzle = None
+        results = {}
+        try:
+            start = time.perf_counter()
+            for frame in range(frames):
+                self.show_board(states[frame % len(states)])
+                self.render_frame(surface, ticks=frame * 33)
+            results['board'] = frames / (time.perf_counter() - start)
+
+            # animate_swap draws 6 frames per call
+            drawn = 0
+            start = time.perf_counter()
+            for frame in range(0, frames, 6):
+                self.show_board(states[frame % len(states)])
+                self.animate_swap((3, 3), (4, 3), surface)
+                drawn += 6
+            results['swap'] = drawn / (time.perf_counter() - start)
+        finally:
+            self.restore_display_state(saved)
+        return results
+
+    def target_frame_rate(self):
+        """
+        Pick the frame rate for the current state of the screen
+        
+        Returns:
+            int: MAX_FPS while effects animate, FPS while special tiles glow, 0 when idle
+        """
+        if self.in_start_menu or self.game_over or self.grid is None:
+            return 0  # Menus only change on input
+        
+        if self.effects.count or (self.chain_multiplier > 1 and self.multiplier_display.display_time > 0):
+            return MAX_FPS
+        
+        for row in self.grid:
+            for tile in row:
+                if tile and tile.special_type:
+                    return FPS  # Keep the glow pulsing
+        
+        return 0
+
+    def get_events(self):
+        # Block until input arrives when the screen is up to date and nothing animates
+        if self.power_saving and not self.redraw_pending and self.target_frame_rate() == 0:
+            events = [pygame.event.wait()] + pygame.event.get()
+        else:
+            events = pygame.event.get()
+        self.redraw_pending = bool(events)
+        return events
+
+    def tick(self):
+        # Redraws caused by input alone are capped to FPS
+        self.clock.tick(self.target_frame_rate() or FPS)
+        self.count_frame()
+
+    def count_frame(self):
+        # Measure the frame rate actually achieved, including time spent sleeping
+        self.frame_count += 1
+        now = pygame.time.get_ticks()
+        elapsed = now - self.fps_timer
+        if elapsed >= 1000:
+            self.effective_fps = self.frame_count * 1000 / elapsed
+            self.frame_count = 0
+            self.fps_timer = now
+            if self.show_fps:
+                pygame.display.set_caption(f'Swap\'em! A Match Three Game ({self.effective_fps:.1f} FPS)')
+                print(f"{self.effective_fps:.1f} FPS")
+
+    def play_move(self, tile1, tile2):
+        for delay in self.move_steps(tile1, tile2):
+            pygame.time.delay(delay)
+            pygame.event.pump()
+
+    def move_steps(self, tile1, tile2):
+        """
+        Swap two tiles that make a match and animate the whole cascade
+        
+        Yields:
+            int: Milliseconds to wait before the next frame, so the same cascade can be
+            driven by run() with pygame.time.delay or by run_async() with asyncio.sleep
+        """
+        # Actually swap in real grid
+        yield from self.animate_swap_steps(tile1, tile2)
+        self.swap_tiles(tile1, tile2)
+        delta = MoveDelta(tile1, tile2) if self.broadcaster else None
+        
+        # Reset chain multiplier
+        self.chain_multiplier = 1
+        chain_reaction_occurred = False
+        
+        # Repeat match and fall process with cascading matches
+        while True:
+            matches = self.check_matches()
+            if not matches:
+                break
+
+            # Track if chain reaction occurs
+            if matches:
+                chain_reaction_occurred = True
+
+            # Determine tiles to remove with special tile chain reactions
+            tiles_to_remove = self.handle_special_tile_effects(matches)
+
+            # Calculate and add score
+            round_score = self.calculate_match_score(matches, tiles_to_remove)
+            self.score += round_score
+
+            # Remove tiles with visual feedback
+            for y, x in tiles_to_remove:
+                self.effects.add_fade(x*TILE_SIZE, y*TILE_SIZE + 36)
+                self.grid[y][x] = None
+            if self.puzzle:
+                self.puzzle_targets -= tiles_to_remove
+
+            # Show the points earned over the center of the match
+            center_x = sum(x for (y, x) in matches) * TILE_SIZE // len(matches) + TILE_SIZE // 2
+            center_y = sum(y for (y, x) in matches) * TILE_SIZE // len(matches) + TILE_SIZE // 2 + 36
+            self.effects.add_popup(center_x, center_y, round_score)
+
+            # Create special tile in the top row if conditions are met
+            special = None
+            if len(matches) >= 4:
+                special = self.handle_match_creation(matches)
+            # Cells the fall will refill in each column
+            empty_slots = [sum(1 for y in range(GRID_HEIGHT) if self.grid[y][x] is None) for x in range(GRID_WIDTH)]
+                
+            # Visual updates with delay
+            self.screen.fill(pygame.Color('black'))
+            self.draw_score()
+            self.draw_grid()
+            self.draw_game_state()
+            yield ANIMATION_SPEED * 15  # Add a slight delay for visual excitement
+            
+            # Animate falling with delay
+            yield from self.animate_fall_steps()
+            self.fill_grid()
+
+            if delta:
+                # New tiles end up at the top of their column, in the order rules.apply_gravity creates them
+                refills = [self.grid[y][x].color for x in range(GRID_WIDTH) for y in range(empty_slots[x])]
+                delta.add_step(tiles_to_remove, special, refills, round_score)
+            
+            # Increase chain multiplier, cap at 5x
+            if chain_reaction_occurred:
+                self.chain_multiplier = min(5, self.chain_multiplier + 1)
+                self.multiplier_display.update(self.chain_multiplier)
+
+        # A puzzle ends when its cells are cleared or its moves are used up
+        if self.puzzle:
+            self.puzzle_moves_left -= 1
+            self.puzzle_solved = not self.puzzle_targets
+            if self.puzzle_solved or not self.puzzle_moves_left:
+                self.game_over = True
+
+        # After the main matching loop, check for valid moves
+        if not self.game_over and not self.check_valid_moves():
+            self.game_over = True
+
+        if delta:
+            delta.chain_multiplier = self.chain_multiplier
+            delta.game_over = self.game_over
+            self.broadcaster.publish_move(delta)
+
+        # Puzzles are short and leave the saved endless game alone
+        if not self.game_over and not self.puzzle:
+            self.autosave()
+
+    def start_game(self, num_colors):
+        # Define colors based on selected count
+        global COLORS
+        COLORS = ALL_COLORS[:num_colors]
+        self.current_color_count = num_colors
+        
+        self.high_score = self.high_scores.get(str(self.current_color_count), 0)
+        
+        self.in_start_menu = False
+        self.reset_game()
+
+    def start_puzzle(self, index):
+        """
+        Put puzzle `index` of the pack on the board, opening the pack the first time
+        
+        Returns:
+            bool: True if the puzzle was started, False if the pack could not be read
+        """
+        global COLORS
+        try:
+            if self.puzzles is None:
+                self.puzzles = PuzzlePack(self.puzzle_file)
+            if not len(self.puzzles):
+                raise PackError('The puzzle pack is empty')
+            self.puzzle_index = index % len(self.puzzles)
+            puzzle = self.puzzles.get(self.puzzle_index)
+        except (IOError, PackError) as e:
+            print(f"Could not load puzzle: {e}")
+            return False
+
+        self.current_color_count = puzzle.color_count
+        COLORS = ALL_COLORS[:self.current_color_count]
+        self.puzzle = puzzle
+        self.refill_rng = RefillStream(puzzle.seed)  # The same refills the solver saw
+        self.puzzle_targets = puzzle.target_cells()
+        self.puzzle_moves_left = puzzle.moves
+        self.puzzle_solved = False
+
+        self.grid = puzzle.new_grid()
+        self.effects.clear()
+        self.selected_tile = None
+        self.game_over = False
+        self.game_over_tip = None
+        self.score = 0
+        self.chain_multiplier = 1
+        self.in_start_menu = False
+        self.broadcast_board()
+        return True
+
+    def update_high_score(self):
+        if self.puzzle:
+            return  # Puzzle scores are not high scores
+        # Save high score if applicable
+        if self.score > int(self.high_scores[str(self.current_color_count)]):
+            self.high_scores[str(self.current_color_count)] = self.score
+            self.save_high_scores()
+
+    def return_to_menu(self):
+        self.update_high_score()
+        self.in_start_menu = True
+        self.game_over_tip = None
+
+    def shutdown(self):
+        # Update high score before quitting if needed
+        self.update_high_score()
+
+        # Let the autosave thread finish writing
+        self.autosaver.close()
+        if self.broadcaster:
+            self.broadcaster.close()
+
+        pygame.quit()
+
+    def draw_current_screen(self):
+        # One frame of whatever run() would show in the current state
+        if self.in_start_menu:
+            self.draw_start_menu()
+        elif self.puzzle and self.game_over:
+            self.puzzle_result_screen()
+        elif self.game_over:
+            # A finished game cannot be resumed
+            if self.saved_game:
+                self.discard_saved_game()
+            self.game_over_screen()
+        else:
+            self.screen.fill(pygame.Color('black'))
+            self.draw_score()
+            self.draw_grid()
+            self.draw_game_state()
+
+            # Check for game over at the end of the frame
+            if not self.game_over and not self.check_valid_moves():
+                self.game_over = True
+
+    async def run_async(self, sources, animation_speed=1.0):
+        """
+        Asyncio version of run() where frames, input and cascades are coroutines
+        
+        Args:
+            sources (list): Input sources such as PygameInput, ScriptedInput or SocketInput,
+                all feeding the same command queue
+            animation_speed (float): Multiplier for animation delays, 0 plays cascades
+                without waiting while still rendering every frame
+        """
+        commands = asyncio.Queue()
+        self.running = True
+        self.animating = False
+        self.command_accepted = True  # Result of the last handle_command()
+        tasks = [asyncio.create_task(self.frame_loop(sources, commands))]
+        tasks += [asyncio.create_task(self.run_source(source, commands)) for source in sources]
+        try:
+            while self.running:
+                command = await commands.get()
+                try:
+                    self.command_accepted = await self.handle_command(command, animation_speed)
+                finally:
+                    commands.task_done()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.shutdown()
+
+    async def run_source(self, source, commands):
+        # A failing input source ends the game instead of leaving the loop waiting forever
+        try:
+            await source.produce(self, commands)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Input source failed: {e!r}")
+            commands.put_nowait(('quit',))
+
+    async def frame_loop(self, sources, commands):
+        while self.running:
+            for event in pygame.event.get():
+                self.redraw_pending = True
+                if event.type == pygame.QUIT:
+                    commands.put_nowait(('quit',))
+                for source in sources:
+                    if hasattr(source, 'handle_event'):
+                        source.handle_event(self, event, commands)
+
+            # Cascades draw their own frames, and unchanged screens are not redrawn
+            frame_rate = self.target_frame_rate()
+            if not self.animating and (frame_rate or self.redraw_pending):
+                self.redraw_pending = False
+                self.draw_current_screen()
+                self.count_frame()
+
+            await asyncio.sleep(1 / (frame_rate or FPS))
+
+    async def handle_command(self, command, animation_speed=1.0):
+        """
+        Apply one command from an input source
+        
+        Args:
+            command (tuple): ('start', color count), ('puzzle', index), ('move', (x1, y1), (x2, y2)),
+                ('resume',), ('menu',) or ('quit',)
+
+        Returns:
+            bool: False if the command was rejected, like an illegal move or a missing saved game
+        """
+        self.redraw_pending = True
+        name = command[0]
+        if name == 'quit':
+            self.running = False
+        elif name == 'start':
+            if command[1] not in COLOR_COUNTS:
+                return False  # No such difficulty level
+            if not self.in_start_menu:
+                self.update_high_score()
+            self.game_over_tip = None
+            self.start_game(command[1])
+        elif name == 'puzzle':
+            if not self.in_start_menu:
+                self.update_high_score()
+            return self.start_puzzle(command[1])
+        elif name == 'resume':
+            if not self.saved_game:
+                return False
+            return self.resume_game()
+        elif name == 'menu':
+            if not self.in_start_menu:
+                self.return_to_menu()
+        elif name == 'move':
+            tile1, tile2 = command[1], command[2]
+            if self.in_start_menu or self.game_over or not rules.is_valid_swap(self.grid, tile1, tile2):
+                return False  # Illegal move, do nothing
+
+            self.animating = True
+            try:
+                for delay in self.move_steps(tile1, tile2):
+                    # Always yield to the event loop so input and other sources keep running
+                    await asyncio.sleep(delay * animation_speed / 1000)
+            finally:
+                self.animating = False
+        return True
 
     def run(self):
         running = True
@@ -671,7 +1242,7 @@ class MatchThreeGame:
             if self.in_start_menu:
                 self.draw_start_menu()  # Ensure menu is redrawn each frame
                 
-                for event in pygame.event.get():
+                for event in self.get_events():
                     if event.type == pygame.QUIT:
                         running = False
                     
@@ -681,24 +1252,43 @@ class MatchThreeGame:
 
                     if event.type == pygame.MOUSEBUTTONDOWN:
                         mouse_pos = pygame.mouse.get_pos()
+                        if self.saved_game and self.resume_button.collidepoint(mouse_pos):
+                            self.resume_game()
+                            break
+
+                        if os.path.exists(self.puzzle_file) and self.puzzle_button.collidepoint(mouse_pos):
+                            self.start_puzzle(self.puzzle_index)
+                            break
+
                         for button_rect, num_colors in self.color_buttons:
                             if button_rect.collidepoint(mouse_pos):
-                                # Define colors based on selected count
-                                global COLORS
-                                COLORS = ['red', 'blue', 'green', 'yellow', 'purple', 'aqua', 'hotpink', 'chocolate'][:int(num_colors)]
-                                self.current_color_count = int(num_colors)
-                                
-                                self.high_score = self.high_scores.get(str(self.current_color_count), 0)
-                                
-                                self.in_start_menu = False
-                                self.reset_game()
+                                self.start_game(int(num_colors))
                                 break
                 
-                self.clock.tick(30)  # Control frame rate
+                self.tick()  # Control frame rate
+
+            elif self.puzzle and self.game_over:
+                self.puzzle_result_screen()
+                for event in self.get_events():
+                    if event.type == pygame.QUIT:
+                        running = False
+
+                    if event.type == pygame.MOUSEBUTTONDOWN:
+                        self.start_puzzle(self.next_puzzle_index())
+
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_ESCAPE:
+                            self.return_to_menu()
+
+                self.tick()
 
             elif self.game_over:
+                # A finished game cannot be resumed
+                if self.saved_game:
+                    self.discard_saved_game()
+
                 self.game_over_screen() 
-                for event in pygame.event.get():
+                for event in self.get_events():
                     if event.type == pygame.QUIT:
                         running = False
 
@@ -713,8 +1303,10 @@ class MatchThreeGame:
                             self.game_over_tip = None
                             self.in_start_menu = True
         
+                self.tick()
+        
             else:  # Main gameplay
-                for event in pygame.event.get():
+                for event in self.get_events():
                     if event.type == pygame.QUIT:
                         running = False
 
@@ -725,17 +1317,12 @@ class MatchThreeGame:
                     if event.type == pygame.KEYDOWN:
                         if event.key == pygame.K_ESCAPE:
                             # Save high score if applicable and return to menu
-                            if self.score > int(self.high_scores[str(self.current_color_count)]):
-                                self.high_scores[str(self.current_color_count)] = self.score
-                                self.save_high_scores()
-                            self.in_start_menu = True
-                            self.game_over_tip = None
+                            self.return_to_menu()
                     
-                    if self.game_over and event.type == pygame.MOUSEBUTTONDOWN:
+                    # A finished puzzle leaves queued clicks to its result screen
+                    if self.game_over and not self.puzzle and event.type == pygame.MOUSEBUTTONDOWN:
                         # Update high score if needed before resetting
-                        if self.score > int(self.high_scores[str(self.current_color_count)]):
-                            self.high_scores[str(self.current_color_count)] = self.score
-                            self.save_high_scores()
+                        self.update_high_score()
 
                         # Restart game on mouse click when game is over
                         self.reset_game()
@@ -762,59 +1349,7 @@ class MatchThreeGame:
                                 
                                 if test_matches:
                                     # Actually swap in real grid
-                                    self.animate_swap(self.selected_tile, clicked_tile)
-                                    self.swap_tiles(self.selected_tile, clicked_tile)
-                                    
-                                    # Reset chain multiplier
-                                    self.chain_multiplier = 1
-                                    chain_reaction_occurred = False
-                                    
-                                    # Repeat match and fall process with cascading matches
-                                    while True:
-                                        matches = self.check_matches()
-                                        if not matches:
-                                            break
-
-                                        # Track if chain reaction occurs
-                                        if matches:
-                                            chain_reaction_occurred = True
-
-                                        # Determine tiles to remove with special tile chain reactions
-                                        tiles_to_remove = self.handle_special_tile_effects(matches)
-
-                                        # Calculate and add score
-                                        round_score = self.calculate_match_score(matches, tiles_to_remove)
-                                        self.score += round_score
-
-                                        # Remove tiles with visual feedback
-                                        for y, x in tiles_to_remove:
-                                            rect = pygame.Rect(x*TILE_SIZE, y*TILE_SIZE + 36, TILE_SIZE, TILE_SIZE)
-                                            self.removal_effects.append((rect, 255))
-                                            self.grid[y][x] = None
-
-                                        # Create special tile in the top row if conditions are met
-                                        if len(matches) >= 4:
-                                            self.handle_match_creation(matches)
-                                            
-                                        # Visual updates with delay
-                                        self.screen.fill(pygame.Color('black'))
-                                        self.draw_score()
-                                        self.draw_grid()
-                                        self.draw_game_state()
-                                        pygame.time.delay(ANIMATION_SPEED * 15)  # Add a slight delay for visual excitement
-                                        
-                                        # Animate falling with delay
-                                        self.animate_fall_with_delay()
-                                        self.fill_grid()
-                                        
-                                        # Increase chain multiplier, cap at 5x
-                                        if chain_reaction_occurred:
-                                            self.chain_multiplier = min(5, self.chain_multiplier + 1)
-                                            self.multiplier_display.update(self.chain_multiplier)
-
-                                    # After the main matching loop, check for valid moves
-                                    if not self.game_over and not self.check_valid_moves():
-                                        self.game_over = True
+                                    self.play_move(self.selected_tile, clicked_tile)
                                 else:
                                     # Illegal move, do nothing
                                     pass
@@ -832,11 +1367,7 @@ class MatchThreeGame:
                     if event.type == pygame.KEYDOWN:
                         if event.key == pygame.K_ESCAPE:
                             # Save high score if applicable and return to menu
-                            if self.score > int(self.high_scores[str(self.current_color_count)]):
-                                self.high_scores[str(self.current_color_count)] = self.score
-                                self.save_high_scores()
-                            self.in_start_menu = True
-                            self.game_over_tip = None
+                            self.return_to_menu()
 
                 # Remove the separate game over rendering block
                 self.screen.fill(pygame.Color('black'))
@@ -848,15 +1379,353 @@ class MatchThreeGame:
                 if not self.game_over and not self.check_valid_moves():
                     self.game_over = True
 
-                self.clock.tick(30)
+                self.tick()
 
-        # Update high score before quitting if needed
-        if self.score > int(self.high_scores[str(self.current_color_count)]):
-            self.high_scores[str(self.current_color_count)] = self.score
-            self.save_high_scores()
+        self.shutdown()
+
+    def receive_broadcast(self, connection):
+        # Runs on a thread and hands every frame to the pygame loop as an event
+        try:
+            for message_type, payload in read_frames(connection):
+                pygame.event.post(pygame.event.Event(BROADCAST_EVENT, message_type=message_type, payload=payload))
+        except OSError:
+            pass
+        pygame.event.post(pygame.event.Event(BROADCAST_EVENT, message_type=None, payload=b''))
+
+    def show_broadcast(self, mirror, steps):
+        # Copy the mirrored board to the screen state and replay the removals as effects
+        global COLORS
+        if mirror.color_count != self.current_color_count:
+            self.current_color_count = mirror.color_count
+            COLORS = ALL_COLORS[:self.current_color_count]
+            self.high_score = self.high_scores.get(str(self.current_color_count), 0)
+        if not steps:
+            self.effects.clear()
+
+        self.grid = mirror.grid
+        self.score = mirror.score
+        self.game_over = mirror.game_over
+        if mirror.chain_multiplier != self.chain_multiplier:
+            self.chain_multiplier = mirror.chain_multiplier
+            self.multiplier_display.update(self.chain_multiplier)
+
+        for removed, special, step_score in steps:
+            for y, x in removed:
+                self.effects.add_fade(x*TILE_SIZE, y*TILE_SIZE + 36)
+            if removed:
+                center_x = sum(x for (y, x) in removed) * TILE_SIZE // len(removed) + TILE_SIZE // 2
+                center_y = sum(y for (y, x) in removed) * TILE_SIZE // len(removed) + TILE_SIZE // 2 + 36
+                self.effects.add_popup(center_x, center_y, step_score)
+
+    def draw_spectator_screen(self, status=None):
+        self.screen.fill(pygame.Color('black'))
+        if self.grid is not None:
+            self.draw_score()
+            self.draw_grid()
+            if self.chain_multiplier > 1:
+                self.multiplier_display.draw(self.screen, (SCREEN_WIDTH - 100, 100))
+            self.effects.update_and_draw(self.screen)
+        if self.game_over:
+            status = status or 'Game Over'
+        if status:
+            status_text = self.font.render(status, True, pygame.Color('white'))
+            status_rect = status_text.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))
+            pygame.draw.rect(self.screen, pygame.Color('black'), status_rect.inflate(20, 10))
+            self.screen.blit(status_text, status_rect)
+        pygame.display.flip()
 
+    def spectate(self, host='127.0.0.1', port=7778):
+        """
+        Watch a game broadcast with --broadcast, rebuilding the board from its deltas
+
+        The spectator only renders: it never saves the game or touches the high scores.
+        """
+        try:
+            connection = socket.create_connection((host, port))
+        except OSError as e:
+            print(f"Could not connect to {host}:{port}: {e}")
+            self.autosaver.close()
+            pygame.quit()
+            return
+
+        pygame.display.set_caption(f'Swap\'em! Spectating {host}:{port}')
+        threading.Thread(target=self.receive_broadcast, args=(connection,), name='spectate', daemon=True).start()
+        mirror = BoardMirror()
+        self.in_start_menu = False
+        self.selected_tile = None
+        self.game_over = False
+        self.chain_multiplier = 1
+        status = 'Waiting for a game'
+
+        running = True
+        while running:
+            for event in self.get_events():
+                if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                    running = False
+                elif event.type == BROADCAST_EVENT:
+                    if event.message_type is None:
+                        status = 'Broadcast ended'
+                    else:
+                        self.show_broadcast(mirror, mirror.apply(event.message_type, event.payload))
+                        status = None
+
+            self.draw_spectator_screen(status)
+            self.tick()
+
+        connection.close()
+        self.autosaver.close()
         pygame.quit()
 
-if __name__ == '__main__':
+def parse_command(line):
+    """
+    Parse a text command as used by scripts and the socket input
+    
+    Lines look like 'start 6', 'puzzle 12', 'move 3 4 4 4' (x1 y1 x2 y2), 'resume', 'menu'
+    or 'quit'. Start takes one of COLOR_COUNTS, puzzles are numbered from 1 as on screen.
+    
+    Returns:
+        tuple: The command for MatchThreeGame.handle_command(), or None if the line is not one
+    """
+    words = line.split()
+    if not words:
+        return None
+    try:
+        if words[0] == 'start' and len(words) == 2:
+            if int(words[1]) not in COLOR_COUNTS:
+                return None
+            return ('start', int(words[1]))
+        if words[0] == 'puzzle' and len(words) == 2:
+            return ('puzzle', int(words[1]) - 1)
+        if words[0] == 'move' and len(words) == 5:
+            x1, y1, x2, y2 = map(int, words[1:])
+            return ('move', (x1, y1), (x2, y2))
+    except ValueError:
+        return None
+    if words[0] in ('resume', 'menu', 'quit') and len(words) == 1:
+        return (words[0],)
+    return None
+
+class PygameInput:
+    """Mouse and keyboard input from the game window, with the same controls as run()"""
+    def handle_event(self, game, event, commands):
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            commands.put_nowait(('quit',) if game.in_start_menu else ('menu',))
+
+        if event.type != pygame.MOUSEBUTTONDOWN:
+            return
+        mouse_pos = event.pos
+        if game.in_start_menu:
+            if game.saved_game and game.resume_button.collidepoint(mouse_pos):
+                commands.put_nowait(('resume',))
+                return
+            if os.path.exists(game.puzzle_file) and game.puzzle_button.collidepoint(mouse_pos):
+                commands.put_nowait(('puzzle', game.puzzle_index))
+                return
+            for button_rect, num_colors in game.color_buttons:
+                if button_rect.collidepoint(mouse_pos):
+                    commands.put_nowait(('start', int(num_colors)))
+        elif game.puzzle and game.game_over:
+            commands.put_nowait(('puzzle', game.next_puzzle_index()))
+        elif game.game_over:
+            commands.put_nowait(('menu',))
+        else:
+            clicked_tile = game.get_tile_at_pos((mouse_pos[0], mouse_pos[1] - 36))  # Adjust for score area
+            if not game.selected_tile:
+                game.selected_tile = clicked_tile
+            else:
+                commands.put_nowait(('move', game.selected_tile, clicked_tile))
+                game.selected_tile = None
+
+    async def produce(self, game, commands):
+        # Everything arrives through handle_event()
+        await asyncio.Event().wait()
+
+class ScriptedInput:
+    """
+    Plays a fixed list of commands, then optionally lets a bot play whole games
+    
+    The bot is a policy from swap_em_analysis.POLICIES, called as
+    policy(game, valid_moves, rng). Every command waits until the game has
+    handled the previous one, so the bot always sees the board it plays on.
+    """
+    def __init__(self, commands=(), policy=None, color_count=8, games=1, seed=None, quit_when_done=True):
+        self.commands = list(commands)
+        self.policy = policy
+        self.color_count = color_count
+        self.games = games
+        self.rng = random.Random(seed)
+        self.quit_when_done = quit_when_done
+
+    async def send(self, commands, command):
+        await commands.put(command)
+        await commands.join()
+
+    async def produce(self, game, commands):
+        for command in self.commands:
+            await self.send(commands, command)
+
+        if self.policy:
+            for _ in range(self.games):
+                await self.send(commands, ('start', self.color_count))
+                while not game.in_start_menu and not game.game_over:
+                    valid_moves = rules.valid_moves(game.grid)
+                    if not valid_moves:
+                        break
+                    await self.send(commands, ('move',) + tuple(self.policy(game, valid_moves, self.rng)))
+                print(f"Bot game over, score {game.score}")
+
+        if self.quit_when_done:
+            await commands.put(('quit',))
+
+class SocketInput:
+    """
+    Accepts text commands (see parse_command()) over a local TCP socket
+    
+    Every line is answered with 'ok <score> <game over 0/1>' once the game has
+    handled it, or 'error' if it was not a command or the game rejected it, such
+    as an illegal move.
+    """
+    def __init__(self, host='127.0.0.1', port=7777):
+        self.host = host
+        self.port = port
+
+    async def handle_client(self, game, commands, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = parse_command(line.decode('utf-8', 'replace'))
+                if command is None:
+                    writer.write(b'error\n')
+                else:
+                    await commands.put(command)
+                    await commands.join()
+                    if game.command_accepted:
+                        writer.write(f'ok {game.score} {int(game.game_over)}\n'.encode())
+                    else:
+                        writer.write(b'error\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass  # Cancelled when the game quits while this client is still connected
+        finally:
+            writer.close()
+
+    async def produce(self, game, commands):
+        server = await asyncio.start_server(
+            lambda reader, writer: self.handle_client(game, commands, reader, writer), self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+def seeded_snapshots(count, color_count=8, moves=0):
+    # Boards from seeds 0..count-1, each after `moves` first valid moves
+    snapshots = []
+    for seed in range(count):
+        headless_game = rules.HeadlessGame(color_count, seed=seed)
+        for _ in range(moves):
+            valid_moves = headless_game.valid_moves()
+            if not valid_moves:
+                break
+            headless_game.play_move(*valid_moves[0])
+        snapshots.append(encode_game(headless_game))
+    return snapshots
+
+def main():
+    parser = argparse.ArgumentParser(description="Swap'em! A Match Three Game")
+    parser.add_argument('--render', nargs='*', metavar='SNAPSHOT',
+                        help='render saved games (or seeded boards if none are given) to PNG files without a window')
+    parser.add_argument('--output', default='renders', help='directory for --render images')
+    parser.add_argument('--seeds', type=int, default=10, help='number of seeded boards to render or benchmark')
+    parser.add_argument('--colors', type=int, default=8, choices=COLOR_COUNTS,
+                        help='color count of seeded boards and bot games')
+    parser.add_argument('--moves', type=int, default=20, help='moves played on seeded boards before rendering')
+    parser.add_argument('--benchmark-render', type=int, metavar='FRAMES',
+                        help='measure frames per second of the drawing code without a window')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='run the asyncio game loop (implied by --bot, --script and --listen); '
+                             'it polls for input at the frame rate even when idle, without power saving')
+    parser.add_argument('--bot', metavar='POLICY', help='let a bot play: random, greedy or first')
+    parser.add_argument('--games', type=int, default=1, help='games for the bot to play')
+    parser.add_argument('--script', metavar='FILE', help='play the commands in FILE, one per line')
+    parser.add_argument('--listen', type=int, metavar='PORT', help='accept commands on a local TCP port')
+    parser.add_argument('--speed', type=float, default=1.0, help='animation delay multiplier, 0 for full speed')
+    parser.add_argument('--broadcast', type=int, metavar='PORT', help='stream the game to spectators on a local TCP port')
+    parser.add_argument('--spectate', metavar='[HOST:]PORT', help='watch a game streamed with --broadcast')
+    parser.add_argument('--puzzles', metavar='PACK', help='puzzle pack made by swap_em_puzzles.py to play')
+    parser.add_argument('--show-fps', action='store_true',
+                        help='show the effective frame rate in the window title and print it once a second')
+    args = parser.parse_args()
+
+    if args.spectate:
+        host, _, port = args.spectate.rpartition(':')
+        game = MatchThreeGame()
+        game.spectate(host or '127.0.0.1', int(port))
+        return
+
+    broadcaster = Broadcaster(port=args.broadcast) if args.broadcast else None
+
+    if args.use_async or args.bot or args.script or args.listen:
+        sources = [PygameInput()]
+        commands = []
+        if args.script:
+            with open(args.script) as f:
+                commands = [command for command in map(parse_command, f) if command]
+        if args.script or args.bot:
+            from swap_em_analysis import POLICIES
+            policy = POLICIES[args.bot] if args.bot else None
+            # Keep the window open for the player when a script or bot is combined with --listen
+            sources.append(ScriptedInput(commands, policy, args.colors, args.games,
+                                         quit_when_done=not args.listen))
+        if args.listen:
+            sources.append(SocketInput(port=args.listen))
+        game = MatchThreeGame()
+        game.broadcaster = broadcaster
+        game.show_fps = game.show_fps or args.show_fps
+        if args.puzzles:
+            game.puzzle_file = args.puzzles
+        asyncio.run(game.run_async(sources, args.speed))
+        return
+
+    if args.render is None and args.benchmark_render is None:
+        game = MatchThreeGame()
+        game.broadcaster = broadcaster
+        game.show_fps = game.show_fps or args.show_fps
+        if args.puzzles:
+            game.puzzle_file = args.puzzles
+        game.run()
+        return
+
+    # Offscreen modes never open a window
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
     game = MatchThreeGame()
-    game.run()
\ No newline at end of file
+    if args.render:
+        snapshots = []
+        for path in args.render:
+            data = read_file(path)
+            if data is None:
+                print(f"Could not render {path}: the file could not be read")
+                continue
+            try:
+                decode_state(data)
+            except SaveError as e:
+                print(f"Could not render {path}: {e}")
+                continue
+            snapshots.append(data)
+    else:
+        snapshots = seeded_snapshots(args.seeds, args.colors, args.moves)
+
+    if not snapshots:
+        print("Nothing to render")
+    elif args.render is not None:
+        os.makedirs(args.output, exist_ok=True)
+        paths = game.render_snapshots(snapshots, args.output)
+        print(f"Rendered {len(paths)} boards to {args.output}")
+    if snapshots and args.benchmark_render:
+        results = game.benchmark_rendering(snapshots, args.benchmark_render)
+        print(f"Board frames: {results['board']:.1f} FPS, swap animation frames: {results['swap']:.1f} FPS")
+
+    game.autosaver.close()
+    pygame.quit()
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Monte Carlo difficulty calibration for Swap'em!
+
+Plays large numbers of seeded headless games for each color count and reports
+how long games last, how they score and what the boards look like along the way.
+Workers aggregate into histograms and only those are sent back. A histogram
+grows with the range of the values it sees, not with the number of games, so
+memory does not grow with the number of moves simulated.
+
+Usage:
+    python swap_em_analysis.py --games 10000 --colors 5 6 7 8 --policy greedy
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import swap_em_rules as rules
+
+def random_policy(game, moves, rng):
+    return rng.choice(moves)
+
+def first_policy(game, moves, rng):
+    return moves[0]
+
+def greedy_policy(game, moves, rng):
+    """Pick the swap with the largest immediate match, ignoring what the refill brings"""
+    grid = game.grid
+    best_size = 0
+    best_moves = []
+    for move in moves:
+        (x1, y1), (x2, y2) = move
+        grid[y1][x1], grid[y2][x2] = grid[y2][x2], grid[y1][x1]
+        size = len(rules.check_matches(grid))
+        grid[y1][x1], grid[y2][x2] = grid[y2][x2], grid[y1][x1]
+        if size > best_size:
+            best_size = size
+            best_moves = [move]
+        elif size == best_size:
+            best_moves.append(move)
+    return rng.choice(best_moves)
+
+POLICIES = {
+    'random': random_policy,
+    'first': first_policy,
+    'greedy': greedy_policy,
+}
+
+class Distribution:
+    """
+    Streaming summary of a stream of non-negative integers
+
+    Keeps count, sum, sum of squares and extremes exactly, and a histogram with
+    bins of bin_width for percentiles, so memory depends on the value range only.
+    """
+    def __init__(self, bin_width=1):
+        self.bin_width = bin_width
+        self.count = 0
+        self.total = 0
+        self.total_sq = 0
+        self.min = None
+        self.max = None
+        self.bins = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.total_sq += value * value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        key = value // self.bin_width
+        self.bins[key] = self.bins.get(key, 0) + 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def std(self):
+        if self.count < 2:
+            return 0.0
+        variance = (self.total_sq - self.total * self.total / self.count) / (self.count - 1)
+        return math.sqrt(max(0.0, variance))
+
+    def percentile(self, q):
+        """Approximate percentile, exact to within one bin_width"""
+        if not self.count:
+            return 0
+        target = q / 100 * self.count
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen >= target:
+                return key * self.bin_width
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': round(self.mean(), 2),
+            'std': round(self.std(), 2),
+            'min': self.min,
+            'p10': self.percentile(10),
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'max': self.max,
+        }
+
+class Stats:
+    """Everything collected for one color count"""
+    def __init__(self):
+        self.games = 0
+        self.moves = 0
+        self.dead_starts = 0  # Boards dealt without a single valid move
+        self.truncated = 0  # Games stopped at max_moves
+        self.game_length = Distribution()
+        self.score = Distribution(bin_width=100)
+        self.cascade_depth = Distribution()
+        self.valid_moves = Distribution()
+        self.specials_created = {special_type: 0 for special_type in rules.SPECIAL_TYPES}
+        self.specials_triggered = {special_type: 0 for special_type in rules.SPECIAL_TYPES}
+
+    def merge(self, other):
+        self.games += other.games
+        self.moves += other.moves
+        self.dead_starts += other.dead_starts
+        self.truncated += other.truncated
+        self.game_length.merge(other.game_length)
+        self.score.merge(other.score)
+        self.cascade_depth.merge(other.cascade_depth)
+        self.valid_moves.merge(other.valid_moves)
+        for special_type in rules.SPECIAL_TYPES:
+            self.specials_created[special_type] += other.specials_created[special_type]
+            self.specials_triggered[special_type] += other.specials_triggered[special_type]
+
+    def summary(self):
+        per_100_moves = lambda n: round(100 * n / self.moves, 3) if self.moves else 0.0
+        return {
+            'games': self.games,
+            'moves': self.moves,
+            'dead_starts': self.dead_starts,
+            'truncated': self.truncated,
+            'game_length': self.game_length.summary(),
+            'score': self.score.summary(),
+            'cascade_depth': self.cascade_depth.summary(),
+            'valid_moves_per_board': self.valid_moves.summary(),
+            'specials_created_per_100_moves': {k: per_100_moves(v) for k, v in self.specials_created.items()},
+            'specials_triggered_per_100_moves': {k: per_100_moves(v) for k, v in self.specials_triggered.items()},
+        }
+
+def game_seed(seed, color_count, index):
+    # String seeds are hashed deterministically by random.Random
+    return f'{seed}-{color_count}-{index}'
+
+def play_games(task):
+    """
+    Worker entry point: play a chunk of games and return their aggregated Stats
+
+    Args:
+        task (tuple): (color_count, policy name, base seed, first game index, game count, max moves)
+    """
+    color_count, policy_name, seed, start, count, max_moves = task
+    policy = POLICIES[policy_name]
+    stats = Stats()
+
+    for index in range(start, start + count):
+        game = rules.HeadlessGame(color_count, seed=game_seed(seed, color_count, index))
+        # The policy gets its own stream so changing it never changes the refills
+        policy_rng = random.Random(game_seed(seed, color_count, index) + '-policy')
+        moves = game.valid_moves()
+        if not moves:
+            stats.dead_starts += 1
+
+        while moves and game.moves < max_moves:
+            stats.valid_moves.add(len(moves))
+            steps = game.play_move(*policy(game, moves, policy_rng))
+            stats.cascade_depth.add(len(steps))
+            for step in steps:
+                if step.special:
+                    stats.specials_created[step.special[1].special_type] += 1
+                for special_type in step.triggered:
+                    stats.specials_triggered[special_type] += 1
+            moves = game.valid_moves()
+
+        if moves:
+            stats.truncated += 1
+        stats.games += 1
+        stats.moves += game.moves
+        stats.game_length.add(game.moves)
+        stats.score.add(game.score)
+
+    return color_count, stats
+
+def run_analysis(color_counts, games, policy='random', seed=0, workers=None,
+                 max_moves=10000, chunk_size=50, progress=None):
+    """
+    Play `games` games for every color count across a process pool
+
+    Returns:
+        dict: color count -> Stats
+    """
+    tasks = []
+    for color_count in color_counts:
+        for start in range(0, games, chunk_size):
+            tasks.append((color_count, policy, seed, start, min(chunk_size, games - start), max_moves))
+
+    results = {color_count: Stats() for color_count in color_counts}
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        chunks = map(play_games, tasks)
+        for color_count, stats in chunks:
+            results[color_count].merge(stats)
+            if progress:
+                progress(results)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for color_count, stats in pool.imap_unordered(play_games, tasks):
+                results[color_count].merge(stats)
+                if progress:
+                    progress(results)
+    return results
+
+def format_report(results):
+    lines = []
+    for color_count, stats in sorted(results.items()):
+        summary = stats.summary()
+        lines.append(f'== {color_count} colors: {stats.games} games, {stats.moves} moves ==')
+        lines.append(f'  dead starting boards: {stats.dead_starts}, truncated games: {stats.truncated}')
+        for name in ('game_length', 'score', 'cascade_depth', 'valid_moves_per_board'):
+            d = summary[name]
+            lines.append(f"  {name:<22} mean {d['mean']:>9} std {d['std']:>9} "
+                         f"min {d['min']} p10 {d['p10']} p50 {d['p50']} p90 {d['p90']} max {d['max']}")
+        created = summary['specials_created_per_100_moves']
+        triggered = summary['specials_triggered_per_100_moves']
+        lines.append('  specials per 100 moves: ' + ', '.join(
+            f"{k} created {created[k]} triggered {triggered[k]}" for k in rules.SPECIAL_TYPES))
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo difficulty calibration for Swap'em!")
+    parser.add_argument('--games', type=int, default=1000, help='games per color count')
+    parser.add_argument('--colors', type=int, nargs='+', default=[5, 6, 7, 8], choices=rules.COLOR_COUNTS)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--seed', default='0', help='base seed, every game gets its own stream derived from it')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--max-moves', type=int, default=10000, help='stop a game after this many moves')
+    parser.add_argument('--chunk-size', type=int, default=50, help='games per worker task')
+    parser.add_argument('--json', metavar='PATH', help='also write the summary as JSON')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    results = run_analysis(args.colors, args.games, args.policy, args.seed, args.workers,
+                           args.max_moves, args.chunk_size)
+    elapsed = time.perf_counter() - start_time
+
+    print(format_report(results))
+    total_moves = sum(stats.moves for stats in results.values())
+    print(f'\n{total_moves} moves in {elapsed:.1f}s ({total_moves / elapsed:.0f} moves/s)')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({str(k): v.summary() for k, v in results.items()}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""
+Spectator broadcast of a live game as compact per-move deltas.
+
+The player's game hands every move to a Broadcaster, which sends it to all
+connected viewers over a local TCP socket. A viewer keeps a BoardMirror that
+replays the deltas with the same removal, special tile and gravity rules, so
+only the swap, the removed cells, special tile placements, the refill colors
+and score changes go over the wire.
+
+Frames are a B type and H payload length followed by the payload (little endian):
+
+    SNAPSHOT  B color count, B chain multiplier, B game over, I score,
+              one byte per cell as made by swap_em_save.encode_cell()
+    MOVE      B cell 1, B cell 2, B step count, then per cascade step:
+                  B removed count, one byte per removed cell (y * width + x),
+                  B special column (0xFF for none) [+ B special cell code],
+                  B refill count, refill color codes packed two per byte,
+                  H step score
+              and finally B chain multiplier, B game over
+
+A removed cell costs one byte and its refill half a byte; the score is carried
+as step scores, which add up to the player's score. Each viewer has its
+own bounded queue and sender thread; a viewer that falls too far behind has its
+queue replaced by a fresh snapshot, so the player's loop never waits on it.
+"""
+import collections
+import socket
+import struct
+import threading
+
+import swap_em_rules as rules
+from swap_em_rules import GRID_WIDTH, GRID_HEIGHT, ALL_COLORS, Tile
+from swap_em_save import COLOR_CODES, encode_cell, decode_cell
+
+SNAPSHOT = 1
+MOVE = 2
+FRAME_HEADER = struct.Struct('<BH')
+SNAPSHOT_HEADER = struct.Struct('<BBBI')
+MOVE_FOOTER = struct.Struct('<BB')
+STEP_SCORE = struct.Struct('<H')
+NO_SPECIAL = 0xFF
+MAX_BACKLOG = 256  # Frames queued for one viewer before it is resynced
+
+def frame(message_type, payload):
+    return FRAME_HEADER.pack(message_type, len(payload)) + payload
+
+class MoveDelta:
+    """Everything a viewer needs to replay one move"""
+    def __init__(self, tile1, tile2):
+        self.tile1 = tile1
+        self.tile2 = tile2
+        self.steps = []  # (removed cells, special, refill colors, step score)
+        self.chain_multiplier = 1
+        self.game_over = False
+
+    def add_step(self, removed, special, refills, score):
+        """
+        Args:
+            removed (set): (y, x) cells removed in this step
+            special (tuple): (column, Tile) placed by handle_match_creation, or None
+            refills (list): Colors of the new tiles, column by column from the left, top down
+            score (int): Points earned in this step
+        """
+        self.steps.append((removed, special, refills, score))
+
+    def encode(self):
+        (x1, y1), (x2, y2) = self.tile1, self.tile2
+        parts = [bytes((y1 * GRID_WIDTH + x1, y2 * GRID_WIDTH + x2, len(self.steps)))]
+        for removed, special, refills, score in self.steps:
+            parts.append(bytes([len(removed)] + [y * GRID_WIDTH + x for y, x in removed]))
+            if special:
+                column, tile = special
+                parts.append(bytes((column, encode_cell(tile))))
+            else:
+                parts.append(bytes((NO_SPECIAL,)))
+            codes = [COLOR_CODES[color] for color in refills]
+            if len(codes) % 2:
+                codes.append(0)
+            parts.append(bytes([len(refills)] + [codes[i] | codes[i + 1] << 4 for i in range(0, len(codes), 2)]))
+            parts.append(STEP_SCORE.pack(score))
+        parts.append(MOVE_FOOTER.pack(self.chain_multiplier, self.game_over))
+        return frame(MOVE, b''.join(parts))
+
+class ReplayColors:
+    # Stands in for the random generator in rules.apply_gravity and hands out the broadcast refills
+    def __init__(self, colors):
+        self.colors = iter(colors)
+
+    def choice(self, options):
+        return next(self.colors)
+
+class BoardMirror:
+    """A board rebuilt from SNAPSHOT and MOVE frames"""
+    def __init__(self):
+        self.grid = None
+        self.color_count = 8
+        self.score = 0
+        self.chain_multiplier = 1
+        self.game_over = False
+
+    def snapshot_frame(self):
+        cells = bytes(encode_cell(tile) for row in self.grid for tile in row)
+        header = SNAPSHOT_HEADER.pack(self.color_count, self.chain_multiplier, self.game_over, self.score)
+        return frame(SNAPSHOT, header + cells)
+
+    def load_snapshot(self, grid, color_count, score, chain_multiplier, game_over=False):
+        self.grid = [[Tile(tile.color, tile.special_type) if tile else None for tile in row] for row in grid]
+        self.color_count = color_count
+        self.score = score
+        self.chain_multiplier = chain_multiplier
+        self.game_over = game_over
+
+    def apply(self, message_type, payload):
+        """
+        Apply one frame
+
+        Returns:
+            list: (removed cells, special, step score) for every cascade step of a move, empty for snapshots
+        """
+        if message_type == SNAPSHOT:
+            self.color_count, self.chain_multiplier, game_over, self.score = SNAPSHOT_HEADER.unpack_from(payload)
+            self.game_over = bool(game_over)
+            cells = payload[SNAPSHOT_HEADER.size:]
+            self.grid = [[decode_cell(cells[y * GRID_WIDTH + x]) for x in range(GRID_WIDTH)]
+                         for y in range(GRID_HEIGHT)]
+            return []
+        if message_type != MOVE:
+            return []  # Unknown frames are skipped so newer broadcasters stay compatible
+
+        grid = self.grid
+        cell1, cell2, step_count = payload[0], payload[1], payload[2]
+        y1, x1 = divmod(cell1, GRID_WIDTH)
+        y2, x2 = divmod(cell2, GRID_WIDTH)
+        grid[y1][x1], grid[y2][x2] = grid[y2][x2], grid[y1][x1]
+
+        offset = 3
+        steps = []
+        for _ in range(step_count):
+            removed_count = payload[offset]
+            removed = [divmod(cell, GRID_WIDTH) for cell in payload[offset + 1:offset + 1 + removed_count]]
+            offset += 1 + removed_count
+            for y, x in removed:
+                grid[y][x] = None
+
+            special = None
+            column = payload[offset]
+            offset += 1
+            if column != NO_SPECIAL:
+                tile = decode_cell(payload[offset])
+                offset += 1
+                grid[0][column] = tile
+                special = (column, tile)
+
+            refill_count = payload[offset]
+            packed = payload[offset + 1:offset + 1 + (refill_count + 1) // 2]
+            offset += 1 + len(packed)
+            codes = []
+            for byte in packed:
+                codes.append(byte & 0x0F)
+                codes.append(byte >> 4)
+            refills = [ALL_COLORS[code - 1] for code in codes[:refill_count]]
+            rules.apply_gravity(grid, rules.get_colors(self.color_count), ReplayColors(refills))
+
+            step_score, = STEP_SCORE.unpack_from(payload, offset)
+            offset += STEP_SCORE.size
+            self.score += step_score
+            steps.append((removed, special, step_score))
+
+        self.chain_multiplier, game_over = MOVE_FOOTER.unpack_from(payload, offset)
+        self.game_over = bool(game_over)
+        return steps
+
+class Spectator:
+    """One connected viewer with its own queue and sender thread"""
+    def __init__(self, connection, max_backlog):
+        self.connection = connection
+        self.max_backlog = max_backlog
+        self.frames = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name='spectator', daemon=True)
+        self.thread.start()
+
+    def push(self, data, resync_frame=None):
+        # Called with the broadcaster lock held; never blocks on the network
+        with self.condition:
+            if len(self.frames) >= self.max_backlog and resync_frame is not None:
+                # Too far behind: skip to the current board instead of queueing more
+                self.frames.clear()
+                self.frames.append(resync_frame)
+            else:
+                self.frames.append(data)
+            self.condition.notify()
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while not self.frames and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        return
+                    data = self.frames.popleft()
+                self.connection.sendall(data)
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+
+class Broadcaster:
+    """
+    Serves a live game to spectators on a local TCP port
+
+    The game calls publish_snapshot() when a board is dealt or resumed and
+    publish_move() after every move. Both only encode the frame, update the
+    broadcaster's own mirror and queue the bytes; sending happens on the
+    spectators' threads.
+    """
+    def __init__(self, host='127.0.0.1', port=7778, max_backlog=MAX_BACKLOG):
+        self.max_backlog = max_backlog
+        self.mirror = BoardMirror()
+        self.spectators = []
+        self.lock = threading.Lock()
+        self.server = socket.create_server((host, port))
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self.accept_loop, name='broadcast', daemon=True)
+        self.thread.start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return  # Server socket closed
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            spectator = Spectator(connection, self.max_backlog)
+            with self.lock:
+                # Newcomers start from the current board
+                if self.mirror.grid is not None:
+                    spectator.push(self.mirror.snapshot_frame())
+                self.spectators.append(spectator)
+
+    def _send_locked(self, data, resync):
+        # Called with the lock held, so no viewer joins between the mirror update and the push
+        self.spectators = [spectator for spectator in self.spectators if not spectator.closed]
+        resync_frame = self.mirror.snapshot_frame() if resync and self.spectators else None
+        for spectator in self.spectators:
+            spectator.push(data, resync_frame)
+
+    def publish_snapshot(self, grid, color_count, score, chain_multiplier, game_over=False):
+        with self.lock:
+            self.mirror.load_snapshot(grid, color_count, score, chain_multiplier, game_over)
+            self._send_locked(self.mirror.snapshot_frame(), resync=False)
+
+    def publish_move(self, delta):
+        data = delta.encode()
+        with self.lock:
+            self.mirror.apply(MOVE, data[FRAME_HEADER.size:])
+            self._send_locked(data, resync=True)
+
+    def close(self):
+        self.server.close()
+        with self.lock:
+            for spectator in self.spectators:
+                spectator.close()
+            self.spectators = []
+
+def read_frames(connection):
+    """
+    Yield (type, payload) for every frame received until the connection closes
+    """
+    buffer = b''
+    while True:
+        data = connection.recv(65536)
+        if not data:
+            return
+        buffer += data
+        while len(buffer) >= FRAME_HEADER.size:
+            message_type, length = FRAME_HEADER.unpack_from(buffer)
+            end = FRAME_HEADER.size + length
+            if len(buffer) < end:
+                break
+            yield message_type, buffer[FRAME_HEADER.size:end]
+            buffer = buffer[end:]
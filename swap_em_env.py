@@ -0,0 +1,241 @@
+"""
+Gym-style reinforcement learning environments for Swap'em!
+
+Actions index rules.SWAPS, the 112 adjacent swaps of the 8x8 board. Observations
+are integer arrays of shape (2, GRID_HEIGHT, GRID_WIDTH): plane 0 holds the color
+of each tile (1..color_count, 0 for an empty cell) and plane 1 its special type
+(0 normal, 1 'L', 2 'D', 3 'X'). The reward of a move is the score it earns, as
+computed by calculate_match_score for every step of the cascade.
+
+Pygame is not needed. NumPy is optional: when it is installed observations,
+masks and batched results are NumPy arrays, otherwise nested Python lists.
+"""
+import multiprocessing
+
+import swap_em_rules as rules
+from swap_em_save import SPECIAL_CODES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ACTION_COUNT = len(rules.SWAPS)
+
+class SwapEmEnv:
+    """
+    Single game environment with a reset/step interface
+
+    Illegal actions, including indexes outside 0..ACTION_COUNT-1, leave the board
+    untouched, earn invalid_action_reward and do not count as a move.
+    """
+    action_count = ACTION_COUNT
+    observation_shape = (2, rules.GRID_HEIGHT, rules.GRID_WIDTH)
+
+    def __init__(self, color_count=8, seed=None, max_moves=None, invalid_action_reward=0):
+        self.color_count = color_count
+        self.max_moves = max_moves
+        self.invalid_action_reward = invalid_action_reward
+        self.color_codes = {color: code for code, color in enumerate(rules.get_colors(color_count), start=1)}
+        self.color_codes[None] = 0
+        self.game = rules.HeadlessGame(color_count, seed=seed)
+        self.mask = rules.valid_move_mask(self.game.grid)
+
+    def reset(self, seed=None):
+        """
+        Returns:
+            tuple: (observation, info)
+        """
+        self.game.reset(seed)
+        self.mask = rules.valid_move_mask(self.game.grid)
+        return self.observation(), self.info(0, True)
+
+    def step(self, action):
+        """
+        Play rules.SWAPS[action]
+
+        Returns:
+            tuple: (observation, reward, terminated, truncated, info); terminated means
+            no valid moves are left, truncated that max_moves was reached
+        """
+        if not 0 <= action < ACTION_COUNT or not self.mask[action]:
+            reward = self.invalid_action_reward
+            steps = []
+        else:
+            # The mask already proved the swap legal, and the new mask decides game over
+            steps = self.game.resolve_move(*rules.SWAPS[action])
+            reward = sum(step.score for step in steps)
+            self.mask = rules.valid_move_mask(self.game.grid)
+            self.game.game_over = not any(self.mask)
+
+        terminated = not any(self.mask)
+        truncated = not terminated and self.max_moves is not None and self.game.moves >= self.max_moves
+        return self.observation(), reward, terminated, truncated, self.info(len(steps), bool(steps))
+
+    def observation(self):
+        color_codes = self.color_codes
+        colors = []
+        specials = []
+        for row in self.game.grid:
+            colors.append([color_codes[tile.color] if tile else 0 for tile in row])
+            specials.append([SPECIAL_CODES[tile.special_type] if tile else 0 for tile in row])
+        if np is not None:
+            return np.array((colors, specials), dtype=np.int8)
+        return [colors, specials]
+
+    def action_mask(self):
+        if np is not None:
+            return np.array(self.mask, dtype=bool)
+        return list(self.mask)
+
+    def info(self, cascade_depth, valid):
+        return {
+            'action_mask': self.action_mask(),
+            'score': self.game.score,
+            'moves': self.game.moves,
+            'cascade_depth': cascade_depth,
+            'valid_action': valid,
+        }
+
+def step_envs(envs, actions):
+    """
+    Step every env with its action, resetting the ones whose game ended
+
+    Returns:
+        tuple: lists of observations, rewards, terminateds, truncateds and infos
+    """
+    observations = []
+    rewards = []
+    terminateds = []
+    truncateds = []
+    infos = []
+    for env, action in zip(envs, actions):
+        observation, reward, terminated, truncated, info = env.step(int(action))
+        if terminated or truncated:
+            info['final_observation'] = observation
+            info['final_score'] = env.game.score
+            observation, reset_info = env.reset()
+            info['action_mask'] = reset_info['action_mask']
+        observations.append(observation)
+        rewards.append(reward)
+        terminateds.append(terminated)
+        truncateds.append(truncated)
+        infos.append(info)
+    return observations, rewards, terminateds, truncateds, infos
+
+def reset_envs(envs, seed):
+    results = [env.reset(None if seed is None else seed + i) for i, env in enumerate(envs)]
+    return [observation for observation, _ in results], [info for _, info in results]
+
+def env_worker(conn, env_kwargs, seeds):
+    # Runs in a subprocess and owns a slice of the envs of a SwapEmVectorEnv
+    envs = [SwapEmEnv(seed=seed, **env_kwargs) for seed in seeds]
+    while True:
+        command, data = conn.recv()
+        if command == 'step':
+            conn.send(step_envs(envs, data))
+        elif command == 'reset':
+            conn.send(reset_envs(envs, data))
+        elif command == 'close':
+            conn.close()
+            break
+
+class SwapEmVectorEnv:
+    """
+    Steps num_envs independent games at once
+
+    Environment i is seeded with seed + i. Finished games are reset automatically,
+    the observation returned for them is the first of the new game and the last
+    one of the old game is kept in infos[i]['final_observation'].
+
+    With workers > 1 the envs are split across that many subprocesses which step
+    their share in parallel, for throughput beyond what one core can do.
+    """
+    action_count = ACTION_COUNT
+
+    def __init__(self, num_envs, color_count=8, seed=0, max_moves=None, invalid_action_reward=0, workers=1):
+        self.num_envs = num_envs
+        env_kwargs = {
+            'color_count': color_count,
+            'max_moves': max_moves,
+            'invalid_action_reward': invalid_action_reward,
+        }
+        self.envs = []
+        self.connections = []
+        self.processes = []
+        self.slices = []
+        if workers > 1:
+            # Contiguous slices keep the results in env order when concatenated
+            bounds = [num_envs * w // workers for w in range(workers + 1)]
+            self.slices = [(bounds[w], bounds[w + 1]) for w in range(workers) if bounds[w] < bounds[w + 1]]
+            for start, end in self.slices:
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(
+                    target=env_worker, args=(child, env_kwargs, range(seed + start, seed + end)), daemon=True)
+                process.start()
+                child.close()
+                self.connections.append(parent)
+                self.processes.append(process)
+        else:
+            self.envs = [SwapEmEnv(seed=seed + i, **env_kwargs) for i in range(num_envs)]
+        self.reset()
+
+    def reset(self, seed=None):
+        if self.connections:
+            for connection, (start, end) in zip(self.connections, self.slices):
+                connection.send(('reset', None if seed is None else seed + start))
+            observations, infos = [], []
+            for connection in self.connections:
+                worker_observations, worker_infos = connection.recv()
+                observations.extend(worker_observations)
+                infos.extend(worker_infos)
+        else:
+            observations, infos = reset_envs(self.envs, seed)
+        self.masks = [info['action_mask'] for info in infos]
+        return self.stack(observations), infos
+
+    def step(self, actions):
+        if self.connections:
+            for connection, (start, end) in zip(self.connections, self.slices):
+                connection.send(('step', [int(action) for action in actions[start:end]]))
+            observations, rewards, terminateds, truncateds, infos = [], [], [], [], []
+            for connection in self.connections:
+                results = connection.recv()
+                observations.extend(results[0])
+                rewards.extend(results[1])
+                terminateds.extend(results[2])
+                truncateds.extend(results[3])
+                infos.extend(results[4])
+        else:
+            observations, rewards, terminateds, truncateds, infos = step_envs(self.envs, actions)
+        self.masks = [info['action_mask'] for info in infos]
+
+        if np is not None:
+            return (np.stack(observations), np.array(rewards, dtype=np.int64),
+                    np.array(terminateds), np.array(truncateds), infos)
+        return observations, rewards, terminateds, truncateds, infos
+
+    def action_masks(self):
+        if np is not None:
+            return np.array(self.masks, dtype=bool)
+        return self.masks
+
+    def stack(self, observations):
+        if np is not None:
+            return np.stack(observations)
+        return observations
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(('close', None))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
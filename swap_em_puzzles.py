@@ -0,0 +1,381 @@
+"""
+Puzzle mode for Swap'em!: clear the marked cells in N moves.
+
+A puzzle is a starting board, a set of target cells and a move limit. A target
+is cleared once a tile is removed from its cell, by a match or by a special
+tile. Refills and special tile placements come from a RefillStream seeded per
+puzzle instead of the global random generator, so a puzzle plays out the same
+in the solver and in the game.
+
+Puzzles are made by playing seeded random moves and marking every cell they
+clear. An exhaustive search then checks that the targets cannot be cleared in
+fewer moves, so the move limit is tight and the stored solution is a shortest one.
+
+Pack layout (little endian):
+
+    header   4s magic, B version, I puzzle count, H puzzles per block, I block count
+    index    I file offset of every block, then the end of the last block
+    blocks   zlib compressed records: B color count, B moves, Q target cells
+             (bit y * width + x), I refill seed, one byte per cell as in
+             swap_em_save, then the solution as one rules.SWAPS index per move
+
+Only the header and index are read when a pack is opened; a block is
+decompressed the first time one of its puzzles is asked for.
+
+Usage:
+    python swap_em_puzzles.py --count 1000 --moves 2 3 4
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import struct
+import time
+import zlib
+
+import swap_em_rules as rules
+from swap_em_rules import GRID_WIDTH, GRID_HEIGHT, Tile
+from swap_em_save import encode_cell, is_valid_cell, decode_cell, write_file
+
+PACK_MAGIC = b'SWPZ'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('<4sBIHI')
+PACK_OFFSET = struct.Struct('<I')
+RECORD = struct.Struct(f'<BBQI{GRID_WIDTH * GRID_HEIGHT}s')
+PACK_BLOCK = 64  # Puzzles per compressed block
+REFILL_LENGTH = 4096  # Draws before a RefillStream wraps around
+
+class PackError(Exception):
+    """Raised for files that are not a puzzle pack this version can read"""
+
+class RefillStream:
+    """
+    Deterministic stand-in for random.Random in apply_gravity and place_special_tile
+
+    Draws come from a table of REFILL_LENGTH values made from the seed, wrapping
+    around at the end, so a stream is described by its seed and position alone
+    and copies share the table.
+    """
+    def __init__(self, seed, position=0, values=None):
+        self.seed = seed
+        self.position = position
+        if values is None:
+            rng = random.Random(seed)
+            values = [rng.getrandbits(16) for _ in range(REFILL_LENGTH)]
+        self.values = values
+
+    def choice(self, options):
+        value = self.values[self.position % REFILL_LENGTH]
+        self.position += 1
+        return options[value % len(options)]
+
+    def copy(self):
+        return RefillStream(self.seed, self.position, self.values)
+
+class Puzzle:
+    """A starting board, the cells to clear, the move limit and a shortest solution"""
+    def __init__(self, color_count, moves, targets, seed, grid, solution):
+        self.color_count = color_count
+        self.moves = moves
+        self.targets = targets  # Bit y * GRID_WIDTH + x for every cell to clear
+        self.seed = seed  # Seed of the RefillStream
+        self.grid = grid
+        self.solution = solution  # Indexes into rules.SWAPS
+
+    def new_grid(self):
+        # The board is shared by everyone playing the puzzle, so hand out copies
+        return [[Tile(tile.color, tile.special_type) for tile in row] for row in self.grid]
+
+    def target_cells(self):
+        return {(y, x) for y in range(GRID_HEIGHT) for x in range(GRID_WIDTH)
+                if self.targets >> (y * GRID_WIDTH + x) & 1}
+
+def play_move(grid, stream, swap, colors):
+    """
+    Resolve a valid swap like rules.HeadlessGame.play_move, without scoring
+
+    Returns:
+        int: Bit mask of the cells cleared by the whole cascade
+    """
+    (x1, y1), (x2, y2) = swap
+    grid[y1][x1], grid[y2][x2] = grid[y2][x2], grid[y1][x1]
+    cleared = 0
+    while True:
+        matches = rules.check_matches(grid)
+        if not matches:
+            return cleared
+        for y, x in rules.find_special_removals(grid, matches):
+            grid[y][x] = None
+            cleared |= 1 << (y * GRID_WIDTH + x)
+        rules.place_special_tile(grid, matches, colors, stream)
+        rules.apply_gravity(grid, colors, stream)
+
+def board_key(grid):
+    return bytes(encode_cell(tile) for row in grid for tile in row)
+
+class Solver:
+    """
+    Depth-first search over every sequence of valid swaps
+
+    States that failed are memoized by board, stream position and targets left,
+    together with the number of moves that was not enough, and are skipped when
+    reached again with no more moves than that. Branches end as soon as the
+    targets are cleared, the moves run out or the board has no valid moves.
+    """
+    def __init__(self, color_count):
+        self.colors = rules.get_colors(color_count)
+        self.failed = {}
+        self.nodes = 0
+
+    def search(self, grid, stream, targets, moves_left):
+        """
+        Returns:
+            list: rules.SWAPS indexes clearing the targets within moves_left, or None
+        """
+        if not targets:
+            return []
+        if not moves_left:
+            return None
+        key = (board_key(grid), stream.position, targets)
+        if self.failed.get(key, -1) >= moves_left:
+            return None
+
+        self.nodes += 1
+        for swap in rules.valid_moves(grid):
+            child = [row[:] for row in grid]
+            child_stream = stream.copy()
+            cleared = play_move(child, child_stream, swap, self.colors)
+            solution = self.search(child, child_stream, targets & ~cleared, moves_left - 1)
+            if solution is not None:
+                return [rules.SWAP_INDEX[swap]] + solution
+
+        self.failed[key] = moves_left
+        return None
+
+def solve(puzzle, max_moves=None):
+    """
+    Find a shortest solution by iterative deepening
+
+    Returns:
+        list: rules.SWAPS indexes of the solution, or None if there is none within max_moves
+            (the puzzle's move limit by default)
+    """
+    solver = Solver(puzzle.color_count)
+    limit = puzzle.moves if max_moves is None else max_moves
+    for moves in range(limit + 1):
+        solution = solver.search(puzzle.new_grid(), RefillStream(puzzle.seed), puzzle.targets, moves)
+        if solution is not None:
+            return solution
+    return None
+
+def check_solution(puzzle, solution):
+    # Replay a solution and tell whether it clears every target within the move limit
+    if len(solution) > puzzle.moves:
+        return False
+    grid = puzzle.new_grid()
+    stream = RefillStream(puzzle.seed)
+    colors = rules.get_colors(puzzle.color_count)
+    targets = puzzle.targets
+    for index in solution:
+        swap = rules.SWAPS[index]
+        if not rules.is_valid_swap(grid, *swap):
+            return False
+        targets &= ~play_move(grid, stream, swap, colors)
+    return not targets
+
+def generate_puzzle(task):
+    """
+    Worker entry point: try to make a puzzle from one seed
+
+    Args:
+        task (tuple): (seed, color count, moves, minimum number of targets)
+
+    Returns:
+        Puzzle: The verified puzzle, or None if the seed gives none
+    """
+    seed, color_count, moves, min_targets = task
+    colors = rules.get_colors(color_count)
+    rng = random.Random(f'puzzle-{seed}')
+    grid = rules.create_grid_without_matches(colors, rng)
+    start_grid = [row[:] for row in grid]
+    stream = RefillStream(seed)
+
+    targets = 0
+    solution = []
+    for _ in range(moves):
+        valid_moves = rules.valid_moves(grid)
+        if not valid_moves:
+            return None
+        swap = rng.choice(valid_moves)
+        solution.append(rules.SWAP_INDEX[swap])
+        targets |= play_move(grid, stream, swap, colors)
+
+    if bin(targets).count('1') < min_targets:
+        return None
+    puzzle = Puzzle(color_count, moves, targets, seed, start_grid, solution)
+    # Tight move limit: no shorter sequence may clear the same cells
+    if solve(puzzle, moves - 1) is not None:
+        return None
+    return puzzle
+
+def generate_pack(count, color_counts=(5, 6, 7, 8), move_counts=(2, 3, 4), seed=0,
+                  min_targets=6, workers=None, progress=None):
+    """
+    Generate `count` puzzles across a process pool
+
+    Seeds are tried in order from `seed`, cycling through the color and move
+    counts, and results are kept in seed order, so the same arguments always
+    give the same pack.
+
+    Returns:
+        list: Puzzle
+    """
+    variants = list(itertools.product(color_counts, move_counts))
+    tasks = ((s, *variants[s % len(variants)], min_targets) for s in itertools.count(seed))
+    workers = workers or os.cpu_count() or 1
+    batch_size = workers * 32
+    puzzles = []
+
+    def collect(results):
+        for puzzle in results:
+            if puzzle and len(puzzles) < count:
+                puzzles.append(puzzle)
+                if progress:
+                    progress(len(puzzles))
+
+    if workers == 1:
+        while len(puzzles) < count:
+            collect(map(generate_puzzle, itertools.islice(tasks, batch_size)))
+    else:
+        # Batches keep the pool from reading the endless task stream all at once
+        with multiprocessing.Pool(workers) as pool:
+            while len(puzzles) < count:
+                collect(pool.imap(generate_puzzle, itertools.islice(tasks, batch_size), chunksize=4))
+    return puzzles
+
+def encode_puzzle(puzzle):
+    cells = board_key(puzzle.grid)
+    return RECORD.pack(puzzle.color_count, puzzle.moves, puzzle.targets, puzzle.seed, cells) + bytes(puzzle.solution)
+
+def decode_puzzle(data, offset):
+    """
+    Raises PackError for records that are cut short or hold values the game cannot play
+
+    Returns:
+        tuple: (Puzzle, offset of the next record)
+    """
+    if offset + RECORD.size > len(data):
+        raise PackError('Puzzle record is truncated')
+    color_count, moves, targets, seed, cells = RECORD.unpack_from(data, offset)
+    offset += RECORD.size
+    if color_count not in rules.COLOR_COUNTS:
+        raise PackError(f'Puzzle has {color_count} colors')
+    if not moves or offset + moves > len(data):
+        raise PackError('Puzzle solution is missing or truncated')
+    for code in cells:
+        if not is_valid_cell(code, color_count):
+            raise PackError(f'Puzzle has an invalid tile {code:#04x}')
+    grid = [[decode_cell(code) for code in cells[y * GRID_WIDTH:(y + 1) * GRID_WIDTH]]
+            for y in range(GRID_HEIGHT)]
+    solution = list(data[offset:offset + moves])
+    if any(index >= len(rules.SWAPS) for index in solution):
+        raise PackError('Puzzle solution has an invalid swap')
+    return Puzzle(color_count, moves, targets, seed, grid, solution), offset + moves
+
+def write_pack(path, puzzles, block_size=PACK_BLOCK):
+    blocks = [zlib.compress(b''.join(encode_puzzle(puzzle) for puzzle in puzzles[start:start + block_size]), 9)
+              for start in range(0, len(puzzles), block_size)]
+    offset = PACK_HEADER.size + PACK_OFFSET.size * (len(blocks) + 1)
+    offsets = []
+    for block in blocks:
+        offsets.append(offset)
+        offset += len(block)
+    offsets.append(offset)
+    header = PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(puzzles), block_size, len(blocks))
+    write_file(path, b''.join([header] + [PACK_OFFSET.pack(o) for o in offsets] + blocks))
+
+class PuzzlePack:
+    """A puzzle pack on disk, read one block at a time"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(PACK_HEADER.size)
+            if len(header) < PACK_HEADER.size:
+                raise PackError('Puzzle pack is truncated')
+            magic, version, self.count, self.block_size, block_count = PACK_HEADER.unpack(header)
+            if magic != PACK_MAGIC:
+                raise PackError('Not a Swap\'em! puzzle pack')
+            if version != PACK_VERSION:
+                raise PackError(f'Unsupported puzzle pack version {version}')
+            if not self.block_size or block_count != (self.count + self.block_size - 1) // self.block_size:
+                raise PackError('Puzzle pack index does not match its puzzle count')
+            index = f.read(PACK_OFFSET.size * (block_count + 1))
+            if len(index) < PACK_OFFSET.size * (block_count + 1):
+                raise PackError('Puzzle pack is truncated')
+        self.offsets = [offset for offset, in PACK_OFFSET.iter_unpack(index)]
+        self.block = None
+        self.block_puzzles = []
+
+    def __len__(self):
+        return self.count
+
+    def get(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(f'No puzzle {index} in a pack of {self.count}')
+        block, position = divmod(index, self.block_size)
+        if block != self.block:
+            with open(self.path, 'rb') as f:
+                f.seek(self.offsets[block])
+                data = f.read(self.offsets[block + 1] - self.offsets[block])
+            try:
+                data = zlib.decompress(data)
+            except zlib.error as e:
+                raise PackError(f'Puzzle pack block {block} is damaged: {e}')
+            puzzles = []
+            offset = 0
+            while offset < len(data):
+                puzzle, offset = decode_puzzle(data, offset)
+                puzzles.append(puzzle)
+            if len(puzzles) != min(self.block_size, self.count - block * self.block_size):
+                raise PackError(f'Puzzle pack block {block} has {len(puzzles)} puzzles')
+            self.block = block
+            self.block_puzzles = puzzles
+        return self.block_puzzles[position]
+
+    def __iter__(self):
+        return (self.get(index) for index in range(self.count))
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a pack of verified Swap'em! puzzles")
+    parser.add_argument('--count', type=int, default=1000, help='puzzles in the pack')
+    parser.add_argument('--colors', type=int, nargs='+', default=list(rules.COLOR_COUNTS), choices=rules.COLOR_COUNTS)
+    parser.add_argument('--moves', type=int, nargs='+', default=[2, 3, 4], help='move limits to generate')
+    parser.add_argument('--min-targets', type=int, default=6, help='fewest cells a puzzle asks to clear')
+    parser.add_argument('--seed', type=int, default=0, help='first seed to try')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--output', default='assets/puzzles.pack', help='pack file to write')
+    parser.add_argument('--verify', metavar='PACK', help='replay the solutions of an existing pack instead')
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.verify:
+        pack = PuzzlePack(args.verify)
+        failed = [index for index, puzzle in enumerate(pack) if not check_solution(puzzle, puzzle.solution)]
+        print(f'{len(pack) - len(failed)} of {len(pack)} solutions clear their puzzle')
+        if failed:
+            print('Failed: ' + ' '.join(map(str, failed)))
+        return
+
+    def progress(done):
+        if done % 100 == 0:
+            print(f'{done} puzzles ({time.perf_counter() - start_time:.0f}s)')
+
+    puzzles = generate_pack(args.count, args.colors, args.moves, args.seed,
+                            args.min_targets, args.workers, progress)
+    write_pack(args.output, puzzles)
+    elapsed = time.perf_counter() - start_time
+    print(f'Wrote {len(puzzles)} puzzles to {args.output} ({os.path.getsize(args.output)} bytes) in {elapsed:.1f}s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,467 @@
+"""
+Game rules of Swap'em! without any Pygame dependency.
+
+The game window, the analysis tools and the training environments all play by
+these functions, so a board behaves the same whether it is rendered or not.
+Grids are lists of rows indexed as grid[y][x], swaps use (x, y) tile positions
+like the mouse handling in swap-em.py, and match sets hold (y, x) pairs.
+"""
+import random
+
+GRID_WIDTH = 8
+GRID_HEIGHT = 8
+COLOR_COUNTS = (5, 6, 7, 8)  # Difficulty levels the game offers
+ALL_COLORS = ['red', 'blue', 'green', 'yellow', 'purple', 'aqua', 'hotpink', 'chocolate']
+SPECIAL_TYPES = ['L', 'D', 'X']
+MAX_CHAIN_MULTIPLIER = 5
+
+class Tile:
+    def __init__(self, color, special_type=None):
+        self.color = color
+        self.special_type = special_type
+
+    def __eq__(self, other):
+        if isinstance(other, Tile):
+            return self.color == other.color
+        return False
+
+    def __str__(self):
+        return f"{self.color} ({self.special_type or 'normal'})"
+
+def get_colors(color_count):
+    return ALL_COLORS[:color_count]
+
+def all_lines():
+    """
+    List every line of three cells, horizontal lines first
+
+    Returns:
+        list: (a, b, c, cells) with flat indexes (y * GRID_WIDTH + x) and the matching (y, x) pairs
+    """
+    lines = []
+    for y in range(GRID_HEIGHT):
+        for x in range(GRID_WIDTH-2):
+            cells = ((y, x), (y, x+1), (y, x+2))
+            lines.append(tuple(cy * GRID_WIDTH + cx for cy, cx in cells) + (cells,))
+    for x in range(GRID_WIDTH):
+        for y in range(GRID_HEIGHT-2):
+            cells = ((y, x), (y+1, x), (y+2, x))
+            lines.append(tuple(cy * GRID_WIDTH + cx for cy, cx in cells) + (cells,))
+    return lines
+
+LINES = all_lines()
+
+def flat_colors(grid):
+    return [tile.color if tile else None for row in grid for tile in row]
+
+def check_matches(grid):
+    """
+    Find every tile that is part of a horizontal or vertical line of three or more
+
+    Returns:
+        set: (y, x) positions of the matched tiles
+    """
+    colors = flat_colors(grid)
+    matches = set()
+    for a, b, c, cells in LINES:
+        color = colors[a]
+        if color is not None and color == colors[b] == colors[c]:
+            matches.update(cells)
+    return matches
+
+def all_swaps():
+    """
+    List every adjacent swap on the board, horizontal swaps first
+
+    Returns:
+        list: ((x1, y1), (x2, y2)) pairs, GRID_HEIGHT*(GRID_WIDTH-1) + GRID_WIDTH*(GRID_HEIGHT-1) of them
+    """
+    swaps = []
+    for y in range(GRID_HEIGHT):
+        for x in range(GRID_WIDTH - 1):
+            swaps.append(((x, y), (x + 1, y)))
+    for y in range(GRID_HEIGHT - 1):
+        for x in range(GRID_WIDTH):
+            swaps.append(((x, y), (x, y + 1)))
+    return swaps
+
+SWAPS = all_swaps()
+SWAP_INDEX = {swap: index for index, swap in enumerate(SWAPS)}
+SWAP_INDEX.update({(tile2, tile1): index for index, (tile1, tile2) in enumerate(SWAPS)})
+
+def line_partners(cell, other):
+    """
+    Find the pairs of cells that complete a line of three through `cell`
+
+    Lines running through `other` are skipped, since after the swap that cell
+    holds the color that just left `cell`.
+
+    Returns:
+        list: (a, b) flat cell indexes (y * GRID_WIDTH + x)
+    """
+    x, y = cell
+    pairs = []
+    for dx, dy in ((1, 0), (0, 1)):
+        for start in range(-2, 1):
+            line = [(x + (start + i) * dx, y + (start + i) * dy) for i in range(3)]
+            if other in line:
+                continue
+            if not all(0 <= lx < GRID_WIDTH and 0 <= ly < GRID_HEIGHT for lx, ly in line):
+                continue
+            a, b = [ly * GRID_WIDTH + lx for lx, ly in line if (lx, ly) != cell]
+            pairs.append((a, b))
+    return pairs
+
+# For every swap: flat indexes of both cells and the partner pairs that would
+# complete a line for the color moving into each of them
+SWAP_PATTERNS = [
+    (y1 * GRID_WIDTH + x1, y2 * GRID_WIDTH + x2,
+     line_partners((x1, y1), (x2, y2)), line_partners((x2, y2), (x1, y1)))
+    for (x1, y1), (x2, y2) in SWAPS
+]
+
+def swap_creates_match(colors, index):
+    """
+    Check whether swap SWAPS[index] creates a match on a flat color list
+
+    Boards at rest never contain matches, so only lines through the two swapped
+    cells can form; this gives the same answer as running check_matches() on the
+    swapped grid.
+    """
+    p, q, p_pairs, q_pairs = SWAP_PATTERNS[index]
+    color_p = colors[p]
+    color_q = colors[q]
+    if color_p == color_q or color_p is None or color_q is None:
+        return False
+    for a, b in p_pairs:
+        if colors[a] == color_q and colors[b] == color_q:
+            return True
+    for a, b in q_pairs:
+        if colors[a] == color_p and colors[b] == color_p:
+            return True
+    return False
+
+def iter_valid_swaps(colors):
+    """
+    Yield the index of every swap that creates a match on a flat color list
+
+    Same test as swap_creates_match(), inlined because this runs for all swaps
+    after every move.
+    """
+    for index, (p, q, p_pairs, q_pairs) in enumerate(SWAP_PATTERNS):
+        color_p = colors[p]
+        color_q = colors[q]
+        if color_p == color_q or color_p is None or color_q is None:
+            continue
+        for a, b in p_pairs:
+            if colors[a] == color_q and colors[b] == color_q:
+                yield index
+                break
+        else:
+            for a, b in q_pairs:
+                if colors[a] == color_p and colors[b] == color_p:
+                    yield index
+                    break
+
+def is_valid_swap(grid, tile1, tile2):
+    index = SWAP_INDEX.get((tuple(tile1), tuple(tile2)))
+    if index is None:
+        return False  # Not adjacent or off the board
+    return swap_creates_match(flat_colors(grid), index)
+
+def line_moves(cell, line):
+    """
+    List the swaps that move a tile into `cell` from outside `line`
+
+    Returns:
+        tuple: (neighbor, swap index) with flat neighbor indexes
+    """
+    y, x = divmod(cell, GRID_WIDTH)
+    moves = []
+    for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+        neighbor = ny * GRID_WIDTH + nx
+        if 0 <= nx < GRID_WIDTH and 0 <= ny < GRID_HEIGHT and neighbor not in line:
+            moves.append((neighbor, SWAP_INDEX[((x, y), (nx, ny))]))
+    return tuple(moves)
+
+# For every line of three: its flat indexes and, for each of them, the swaps
+# that could bring the missing color into that cell
+LINE_MOVES = [
+    (a, b, c, line_moves(a, (a, b, c)), line_moves(b, (a, b, c)), line_moves(c, (a, b, c)))
+    for a, b, c, cells in LINES
+]
+
+def valid_move_mask(grid):
+    """
+    Mark every swap that creates a match
+
+    Walks the lines of three instead of the swaps: a line with two tiles of one
+    color and a different third tile is completed by any swap that brings that
+    color into the third cell from outside the line. Same mask as
+    iter_valid_swaps() in about a third of the time.
+
+    Returns:
+        list: One bool per entry of SWAPS, True where the swap creates a match
+    """
+    colors = flat_colors(grid)
+    mask = [False] * len(SWAPS)
+    for a, b, c, moves_a, moves_b, moves_c in LINE_MOVES:
+        color_a = colors[a]
+        color_b = colors[b]
+        color_c = colors[c]
+        if color_a == color_b:
+            if color_a is None or color_c is None or color_c == color_a:
+                continue
+            color, moves = color_a, moves_c
+        elif color_b == color_c:
+            if color_b is None or color_a is None:
+                continue
+            color, moves = color_b, moves_a
+        elif color_a == color_c:
+            if color_a is None or color_b is None:
+                continue
+            color, moves = color_a, moves_b
+        else:
+            continue
+        for neighbor, index in moves:
+            if colors[neighbor] == color:
+                mask[index] = True
+    return mask
+
+def valid_moves(grid):
+    return [SWAPS[index] for index in iter_valid_swaps(flat_colors(grid))]
+
+def has_valid_moves(grid):
+    for index in iter_valid_swaps(flat_colors(grid)):
+        return True
+    return False
+
+def find_special_removals(grid, initial_matches):
+    """
+    Recursively handle special tile effects, creating a chain reaction of tile removals.
+
+    Args:
+        grid (list): Board to look up special tiles in
+        initial_matches (set): Initial set of matches to process
+
+    Returns:
+        set: All tiles to be removed, including those from special tile chain reactions
+    """
+    tiles_to_remove = set(initial_matches)
+    processed_special_tiles = set()
+
+    def process_special_tile(y, x):
+        # Prevent processing the same special tile multiple times
+        if (y, x) in processed_special_tiles:
+            return set()
+
+        tile = grid[y][x]
+        special_removal = set()
+
+        if tile and tile.special_type:
+            processed_special_tiles.add((y, x))
+
+            if tile.special_type == 'L':  # Horizontal line
+                for col in range(GRID_WIDTH):
+                    special_removal.add((y, col))
+            elif tile.special_type == 'D':  # Vertical line
+                for row in range(GRID_HEIGHT):
+                    special_removal.add((row, x))
+            elif tile.special_type == 'X':  # Cross
+                for col in range(GRID_WIDTH):
+                    special_removal.add((y, col))
+                for row in range(GRID_HEIGHT):
+                    special_removal.add((row, x))
+
+        return special_removal
+
+    # First pass: process initial special tiles in the matches
+    additional_special_removals = set()
+    for y, x in initial_matches:
+        special_removals = process_special_tile(y, x)
+        additional_special_removals.update(special_removals)
+
+    tiles_to_remove.update(additional_special_removals)
+
+    # Recursive pass: check if new special tile removals create more special tile effects
+    while additional_special_removals:
+        next_special_removals = set()
+        for y, x in additional_special_removals:
+            special_removals = process_special_tile(y, x)
+            next_special_removals.update(special_removals)
+
+        tiles_to_remove.update(next_special_removals)
+        additional_special_removals = next_special_removals
+
+    return tiles_to_remove
+
+def place_special_tile(grid, matches, colors, rng=random):
+    """
+    Create a special tile in the top row for matches of four or more tiles
+
+    Returns:
+        tuple: (column, Tile) of the placed special tile, or None if no tile was created
+    """
+    match_count = len(matches)
+
+    # Only proceed if we have enough matches to create a special tile
+    if match_count < 4:
+        return None
+
+    random_color = rng.choice(colors)
+    if match_count == 4:
+        special_tile = Tile(random_color, special_type='L')
+    elif match_count == 5:
+        special_tile = Tile(random_color, special_type='D')
+    else:
+        special_tile = Tile(random_color, special_type='X')
+
+    # Choose a random column from the columns where matches occurred
+    match_columns = set(x for (y, x) in matches)
+    random_col = rng.choice(list(match_columns))
+    # Place the special tile at the top
+    grid[0][random_col] = special_tile
+    return random_col, special_tile
+
+def calculate_match_score(matches, tiles_to_remove, chain_multiplier):
+    # Calculate base score based on number of initial matches
+    match_count = len(matches)
+    extra_tiles = len(tiles_to_remove)
+    base_score = 0
+
+    if match_count == 3:
+        base_score = 30 * chain_multiplier
+    elif match_count == 4:
+        base_score = 50 * chain_multiplier
+    elif match_count == 5:
+        base_score = 100 * chain_multiplier
+    elif match_count >= 6:
+        base_score = 200 * chain_multiplier
+
+    # Calculate bonus points only for additional tiles removed by special effects
+    # (total tiles - matched tiles) * 10 points per tile
+    special_effect_tiles = max(0, extra_tiles - 3)  # Tiles beyond the minimum match of 3
+    special_effect_score = special_effect_tiles * 10 * chain_multiplier
+
+    return base_score + special_effect_score
+
+def apply_gravity(grid, colors, rng=random):
+    """
+    Let tiles fall into empty cells and refill each column from the top
+
+    Columns are processed left to right and new tiles are created top to bottom,
+    the same order the falling animation uses, so a seeded rng refills identically.
+
+    Returns:
+        list: (y, x, Tile) for every newly created tile
+    """
+    refills = []
+    for x in range(GRID_WIDTH):
+        # Remove None values and shift down
+        non_empty = [grid[y][x] for y in range(GRID_HEIGHT) if grid[y][x] is not None]
+        empty_slots = GRID_HEIGHT - len(non_empty)
+        if empty_slots > 0:
+            for y in range(empty_slots):
+                tile = Tile(rng.choice(colors))
+                grid[y][x] = tile
+                refills.append((y, x, tile))
+            for y, tile in enumerate(non_empty, start=empty_slots):
+                grid[y][x] = tile
+    return refills
+
+def create_grid_without_matches(colors, rng=random):
+    while True:
+        grid = [[Tile(rng.choice(colors)) for _ in range(GRID_WIDTH)]
+                for _ in range(GRID_HEIGHT)]
+        if not check_matches(grid):
+            return grid
+
+class CascadeStep:
+    """One round of the match, remove, special tile and refill loop"""
+    def __init__(self, matches, removed, triggered, score, chain_multiplier, special, refills):
+        self.matches = matches
+        self.removed = removed
+        self.triggered = triggered  # Special types of the removed tiles
+        self.score = score
+        self.chain_multiplier = chain_multiplier
+        self.special = special  # (column, Tile) or None
+        self.refills = refills
+
+class HeadlessGame:
+    """
+    A complete game without a window: the board, score and chain multiplier
+
+    Every random choice goes through self.rng, so two games created with the same
+    seed and fed the same moves stay identical.
+    """
+    def __init__(self, color_count=8, seed=None):
+        self.color_count = color_count
+        self.colors = get_colors(color_count)
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        self.grid = create_grid_without_matches(self.colors, self.rng)
+        self.score = 0
+        self.chain_multiplier = 1
+        self.moves = 0
+        self.game_over = False
+
+    def valid_moves(self):
+        return valid_moves(self.grid)
+
+    def play_move(self, tile1, tile2):
+        """
+        Swap two adjacent tiles and resolve the whole cascade
+
+        Returns:
+            list: CascadeStep for every round of matches, empty if the swap was illegal
+        """
+        if not is_valid_swap(self.grid, tile1, tile2):
+            return []
+
+        steps = self.resolve_move(tile1, tile2)
+        self.game_over = not has_valid_moves(self.grid)
+        return steps
+
+    def resolve_move(self, tile1, tile2):
+        """
+        Swap two tiles already known to create a match and resolve the cascade
+
+        Unlike play_move() this neither checks the swap nor updates game_over,
+        for callers that compute the valid moves of the new board themselves.
+
+        Returns:
+            list: CascadeStep for every round of matches
+        """
+        grid = self.grid
+        (x1, y1), (x2, y2) = tile1, tile2
+        grid[y1][x1], grid[y2][x2] = grid[y2][x2], grid[y1][x1]
+
+        self.chain_multiplier = 1
+        steps = []
+        while True:
+            matches = check_matches(grid)
+            if not matches:
+                break
+
+            tiles_to_remove = find_special_removals(grid, matches)
+            round_score = calculate_match_score(matches, tiles_to_remove, self.chain_multiplier)
+            self.score += round_score
+
+            triggered = []
+            for y, x in tiles_to_remove:
+                if grid[y][x].special_type:
+                    triggered.append(grid[y][x].special_type)
+                grid[y][x] = None
+            special = place_special_tile(grid, matches, self.colors, self.rng)
+            refills = apply_gravity(grid, self.colors, self.rng)
+
+            steps.append(CascadeStep(matches, tiles_to_remove, triggered, round_score,
+                                     self.chain_multiplier, special, refills))
+            self.chain_multiplier = min(MAX_CHAIN_MULTIPLIER, self.chain_multiplier + 1)
+
+        self.moves += 1
+        return steps
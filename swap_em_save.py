@@ -0,0 +1,197 @@
+"""
+Binary snapshots of a game in progress.
+
+A snapshot holds the board, score, chain multiplier, color count and the state
+of the random generator that refills the board, so a resumed game continues
+exactly like the original would have. Layout (little endian):
+
+    header   4s magic, B version, B color count, B chain multiplier,
+             B grid width, B grid height, I score
+    cells    one byte per cell, row by row: color index + 1 in the low nibble
+             (0 for empty), special type code in the high nibble
+    rng      B random.getstate() version, 625 I words, B has gauss_next, d gauss_next
+
+Version 1 snapshots are 2,587 bytes and decode in well under a millisecond.
+"""
+import os
+import random
+import struct
+import threading
+
+from swap_em_rules import GRID_WIDTH, GRID_HEIGHT, ALL_COLORS, COLOR_COUNTS, Tile
+
+MAGIC = b'SWEM'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBBBBBI')
+RNG_WORDS = 625  # Mersenne Twister state plus its position
+RNG = struct.Struct(f'<B{RNG_WORDS}IBd')
+SPECIAL_CODES = {None: 0, 'L': 1, 'D': 2, 'X': 3}
+SPECIAL_TYPES = {code: special_type for special_type, code in SPECIAL_CODES.items()}
+COLOR_CODES = {color: index + 1 for index, color in enumerate(ALL_COLORS)}
+COLOR_CODES[None] = 0
+
+class SaveError(Exception):
+    """Raised for data that is not a snapshot this version can read"""
+
+def encode_cell(tile):
+    # The one byte per cell shared by snapshots, broadcasts and puzzle packs
+    if not tile:
+        return 0
+    return COLOR_CODES[tile.color] | SPECIAL_CODES[tile.special_type] << 4
+
+def is_valid_cell(code, color_count):
+    # A tile of one of the first color_count colors; empty cells are not valid
+    return 1 <= code & 0x0F <= color_count and code >> 4 in SPECIAL_TYPES
+
+def decode_cell(code):
+    if not code:
+        return None
+    return Tile(ALL_COLORS[(code & 0x0F) - 1], SPECIAL_TYPES[code >> 4])
+
+def encode_state(grid, score, chain_multiplier, color_count, rng_state):
+    """
+    Pack a game into bytes
+
+    Args:
+        grid (list): Board rows of Tile or None
+        score (int): Current score
+        chain_multiplier (int): Current chain multiplier
+        color_count (int): Number of colors in play
+        rng_state (tuple): Result of random.getstate() for the generator refilling the board
+
+    Returns:
+        bytes: The snapshot
+    """
+    rng_version, words, gauss_next = rng_state
+    cells = bytes(encode_cell(tile) for row in grid for tile in row)
+    return b''.join((
+        HEADER.pack(MAGIC, FORMAT_VERSION, color_count, chain_multiplier, GRID_WIDTH, GRID_HEIGHT, score),
+        cells,
+        RNG.pack(rng_version, *words, gauss_next is not None, gauss_next or 0.0),
+    ))
+
+def encode_game(game):
+    # Snapshot of a rules.HeadlessGame
+    return encode_state(game.grid, game.score, game.chain_multiplier, game.color_count, game.rng.getstate())
+
+def decode_state(data):
+    """
+    Unpack a snapshot made by encode_state()
+
+    Every field is checked, so a damaged snapshot raises SaveError instead of
+    handing a broken board or random state to the game.
+
+    Returns:
+        dict: grid, score, chain_multiplier, color_count and rng_state
+    """
+    if len(data) < HEADER.size:
+        raise SaveError('Snapshot is truncated')
+    magic, version, color_count, chain_multiplier, width, height, score = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SaveError('Not a Swap\'em! snapshot')
+    if version != FORMAT_VERSION:
+        raise SaveError(f'Unsupported snapshot version {version}')
+    if (width, height) != (GRID_WIDTH, GRID_HEIGHT):
+        raise SaveError(f'Snapshot is for a {width}x{height} board')
+    if len(data) != HEADER.size + width * height + RNG.size:
+        raise SaveError('Snapshot is truncated')
+    if color_count not in COLOR_COUNTS:
+        raise SaveError(f'Snapshot has {color_count} colors')
+
+    grid = []
+    offset = HEADER.size
+    for y in range(height):
+        row = []
+        for code in data[offset:offset + width]:
+            if not is_valid_cell(code, color_count):
+                raise SaveError(f'Snapshot has an invalid tile {code:#04x}')
+            row.append(decode_cell(code))
+        grid.append(row)
+        offset += width
+
+    rng_values = RNG.unpack_from(data, offset)
+    has_gauss, gauss_next = rng_values[-2:]
+    rng_state = (rng_values[0], rng_values[1:1 + RNG_WORDS], gauss_next if has_gauss else None)
+    try:
+        # Try the state on a scratch generator, the game's own is only set once it is known to work
+        random.Random().setstate(rng_state)
+    except (ValueError, TypeError) as e:
+        raise SaveError(f'Snapshot has an invalid random state: {e}')
+
+    return {
+        'grid': grid,
+        'score': score,
+        'chain_multiplier': chain_multiplier,
+        'color_count': color_count,
+        'rng_state': rng_state,
+    }
+
+def write_file(path, data):
+    # Write next to the target and rename, so a crash never leaves half a snapshot
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def read_file(path):
+    """
+    Returns:
+        bytes: The saved snapshot, or None if there is none
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except IOError:
+        return None
+
+class Autosaver:
+    """
+    Writes snapshots on a background thread so the frame loop never waits on disk
+
+    Only the newest pending snapshot is written; older ones that were not written
+    yet are dropped. close() writes whatever is still pending.
+    """
+    DELETE = object()
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = None
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name='autosave', daemon=True)
+        self.thread.start()
+
+    def save(self, data):
+        with self.condition:
+            self.pending = data
+            self.condition.notify()
+
+    def delete(self):
+        with self.condition:
+            self.pending = self.DELETE
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                data = self.pending
+                self.pending = None
+
+            try:
+                if data is self.DELETE:
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                else:
+                    write_file(self.path, data)
+            except OSError:
+                print("Could not save game")
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()